@@ -0,0 +1,53 @@
+import threading
+
+
+class FirebaseBackend:
+    """
+    Firebase Admin SDK, imported and initialized with the service account on first use
+
+    `auth` and `app_check` are the firebase_admin modules, `firestore` a
+    Firestore client (with FIRESTORE_EMULATOR_HOST set it talks to the
+    emulator). A stand-in for tests only needs the same attributes with the
+    functions that are used.
+    """
+
+    def __init__(self, service_account):
+        self.service_account = service_account
+        self.ready = False
+        self.lock = threading.Lock()
+
+    def initialize(self):
+        if self.ready:
+            return
+        with self.lock:
+            if self.ready:
+                return
+            import firebase_admin
+            from firebase_admin import credentials
+
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                firebase_admin.initialize_app(credentials.Certificate(self.service_account))
+            self.ready = True
+
+    @property
+    def auth(self):
+        self.initialize()
+        from firebase_admin import auth
+
+        return auth
+
+    @property
+    def app_check(self):
+        self.initialize()
+        from firebase_admin import app_check
+
+        return app_check
+
+    @property
+    def firestore(self):
+        self.initialize()
+        from firebase_admin import firestore
+
+        return firestore.client()
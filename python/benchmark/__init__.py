@@ -0,0 +1,11 @@
+"""
+Benchmarks of the assignment solver, without Flask or Firebase
+
+Run from the python directory:
+
+    python -m benchmark --suite quick --solvers cbc,highs,flow --output results.json
+    python -m benchmark --suite full --compare results.json
+"""
+
+from benchmark.generator import generate_election
+from benchmark.harness import SUITES, compare, run_benchmark, run_case
@@ -0,0 +1,38 @@
+import argparse
+import json
+
+from benchmark.harness import SUITES, compare, run_benchmark, write_report
+from solver import SOLVERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the assignment solver backends")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--solvers", default=",".join(SOLVERS), help="comma separated backends")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds per solve")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="result file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative time change worth reporting")
+    args = parser.parse_args()
+
+    solvers = [solver for solver in args.solvers.split(",") if solver]
+    unknown = [solver for solver in solvers if solver not in SOLVERS]
+    if unknown:
+        parser.error(f"unknown solver: {', '.join(unknown)}")
+
+    report = run_benchmark(SUITES[args.suite], solvers, args.seed, args.time_limit, args.repeat)
+    report["meta"]["suite"] = args.suite
+    write_report(report, args.output)
+    print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        for line in compare(previous, report, args.threshold) or ["no changes"]:
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
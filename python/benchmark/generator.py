@@ -0,0 +1,79 @@
+import random
+
+from solver import DEFAULT_POINTS
+
+# exponent of the Zipf-like popularity of the projects, 0 = every project is chosen equally often
+POPULARITY = {"uniform": 0.0, "skewed": 1.0, "extreme": 2.0}
+
+# seats over all projects per student, below 1.0 some projects have to be overbooked
+CAPACITY = {"overbooked": 0.9, "tight": 1.0, "loose": 1.5}
+
+# alternative points a part of the students use instead of DEFAULT_POINTS
+CUSTOM_POINTS = [[1, 3, 9], [1, 2, 3]]
+
+
+def generate_election(
+    students, projects, seed=0, popularity="skewed", capacity="tight", choices=3, custom_points=0.1
+):
+    """
+    Create a random but reproducible election in the format of the /assign payload
+
+    Project popularity follows a Zipf-like distribution, so with "skewed" a
+    few projects are the first choice of many students, like in a real vote.
+    The seats are spread over the projects at random and add up to
+    `students` times the capacity ratio.
+
+    Args:
+        students: Number of students
+        projects: Number of projects, at least `choices`
+        seed: Seed of the random generator, the same arguments always give the same election
+        popularity: Key of POPULARITY
+        capacity: Key of CAPACITY
+        choices: Number of distinct projects every student selects
+        custom_points: Share of students with points from CUSTOM_POINTS
+
+    Returns:
+        tuple: (preferences, projects) as expected by solver.solve_assignment()
+    """
+    if projects < choices:
+        raise ValueError(f"An election with {choices} choices needs at least {choices} projects")
+    rng = random.Random(seed)
+
+    project_ids = [f"p{j}" for j in range(projects)]
+    weights = [1.0 / (rank + 1) ** POPULARITY[popularity] for rank in range(projects)]
+    # popularity should not depend on the order of the ids
+    rng.shuffle(weights)
+
+    # every project gets at least one seat, the rest is spread by random shares
+    seats = max(projects, round(students * CAPACITY[capacity]))
+    shares = [rng.uniform(0.5, 1.5) for _ in range(projects)]
+    total = sum(shares)
+    sizes = [1 + int((seats - projects) * share / total) for share in shares]
+    for j in rng.sample(range(projects), seats - sum(sizes)):
+        sizes[j] += 1
+
+    election_projects = {
+        project_id: {"title": f"Project {j + 1}", "max": size}
+        for j, (project_id, size) in enumerate(zip(project_ids, sizes))
+    }
+
+    cum_weights = []
+    running = 0.0
+    for weight in weights:
+        running += weight
+        cum_weights.append(running)
+
+    preferences = {}
+    for i in range(students):
+        selected = []
+        # weighted sampling without replacement, draws of an already selected project are repeated
+        while len(selected) < choices:
+            project_id = rng.choices(project_ids, cum_weights=cum_weights)[0]
+            if project_id not in selected:
+                selected.append(project_id)
+        points = rng.choice(CUSTOM_POINTS) if rng.random() < custom_points else DEFAULT_POINTS
+        # further choices continue the doubling of the default points
+        points = list(points[:choices]) + [points[-1] * 2 ** k for k in range(1, choices - len(points) + 1)]
+        preferences[f"s{i}"] = {"selected": selected, "points": points}
+
+    return preferences, election_projects
@@ -0,0 +1,195 @@
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark.generator import generate_election
+from solver import MIP_SOLVERS, SOLVERS, get_mip_solver, parse_solver_options, solve_assignment
+
+# (name, students, projects, popularity, capacity) per suite, from a class vote to a whole district
+SUITES = {
+    "quick": [
+        ("s100-p5-uniform-loose", 100, 5, "uniform", "loose"),
+        ("s500-p20-skewed-tight", 500, 20, "skewed", "tight"),
+        ("s2000-p50-skewed-overbooked", 2000, 50, "skewed", "overbooked"),
+    ],
+    "full": [
+        ("s100-p5-uniform-loose", 100, 5, "uniform", "loose"),
+        ("s100-p5-skewed-tight", 100, 5, "skewed", "tight"),
+        ("s500-p20-skewed-tight", 500, 20, "skewed", "tight"),
+        ("s1000-p30-extreme-loose", 1000, 30, "extreme", "loose"),
+        ("s2000-p50-skewed-overbooked", 2000, 50, "skewed", "overbooked"),
+        ("s5000-p100-skewed-tight", 5000, 100, "skewed", "tight"),
+        ("s5000-p100-uniform-loose", 5000, 100, "uniform", "loose"),
+        ("s10000-p200-skewed-tight", 10000, 200, "skewed", "tight"),
+        ("s20000-p300-skewed-tight", 20000, 300, "skewed", "tight"),
+        ("s20000-p300-extreme-overbooked", 20000, 300, "extreme", "overbooked"),
+    ],
+}
+
+
+def _rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def run_case(case, solver, seed, time_limit=None):
+    """
+    Generate one election and solve it, meant to run in a fresh process
+
+    The phases are timed with the progress callback of solve_assignment(),
+    so the measured code is exactly the one behind /assign. For "flow" the
+    extraction is part of the solve phase.
+
+    Returns:
+        dict: Result row with times in seconds and memory in MB
+    """
+    name, students, projects, popularity, capacity = case
+    preferences, election_projects = generate_election(students, projects, seed, popularity, capacity)
+    row = {
+        "case": name,
+        "students": students,
+        "projects": projects,
+        "popularity": popularity,
+        "capacity": capacity,
+        "choices": sum(len(student["selected"]) for student in preferences.values()),
+        "solver": solver,
+        "seed": seed,
+    }
+
+    phases = {}
+    options = parse_solver_options({"time_limit": time_limit} if time_limit else None)
+    if solver in MIP_SOLVERS:
+        # PuLP and highspy are imported lazily, load them before the clock starts so the build phase
+        # measures the model only, a long-running worker pays the import once
+        get_mip_solver(solver, options)
+    # memory of the process before solving, the election itself included
+    baseline = _rss_mb(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    try:
+        result = solve_assignment(
+            preferences,
+            election_projects,
+            solver,
+            options,
+            progress=lambda phase: phases.setdefault(phase, time.perf_counter()),
+        )
+    except Exception as e:
+        return {**row, "error": f"{type(e).__name__}: {e}"}
+    finished = time.perf_counter()
+
+    solve_started = phases.get("solve", finished)
+    extract_started = phases.get("extract", finished)
+    return {
+        **row,
+        "build": solve_started - phases["build"],
+        "solve": extract_started - solve_started,
+        "extract": finished - extract_started if "extract" in phases else None,
+        "total": finished - started,
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": _rss_mb(resource.RUSAGE_SELF),
+        # CBC runs as a child process, its memory is not part of ours
+        "peak_child_rss_mb": _rss_mb(resource.RUSAGE_CHILDREN),
+        "objective": result["objective"],
+        "status": result["status"],
+        "gap": result["gap"],
+        "error": None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(cases, solvers=SOLVERS, seed=0, time_limit=None, repeat=1, log=print):
+    """
+    Solve every case with every backend, each run in its own process
+
+    A fresh process per run keeps the peak memory of one run from hiding
+    the next one and keeps caches of earlier runs out of the timings.
+
+    Args:
+        cases: Entries like the ones in SUITES
+        solvers: Backends to compare
+        seed: Seed of the generator, every backend solves the same elections
+        time_limit: Optional time limit per solve in seconds
+        repeat: Runs per case and backend, e.g. to see the noise of the timings
+        log: Called with a line of text after every run, None for silence
+
+    Returns:
+        dict: {meta: {commit, python, platform, seed, time_limit, created}, results: [row, ...]}
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for case in cases:
+        for solver in solvers:
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    row = executor.submit(run_case, case, solver, seed, time_limit).result()
+                results.append(row)
+                if log is not None:
+                    log(format_row(row))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": seed,
+            "time_limit": time_limit,
+            "created": time.time(),
+        },
+        "results": results,
+    }
+
+
+def format_row(row):
+    if row["error"]:
+        return f"{row['case']:<32} {row['solver']:<6} {row['error']}"
+    extract = "-" if row["extract"] is None else f"{row['extract']:.3f}s"
+    return (
+        f"{row['case']:<32} {row['solver']:<6} build {row['build']:.3f}s  solve {row['solve']:.3f}s  "
+        f"extract {extract}  peak {row['peak_rss_mb']:.0f}MB  objective {row['objective']:g} ({row['status']})"
+    )
+
+
+def compare(previous, current, threshold=0.1):
+    """
+    Changes between two result files, matched by case and solver
+
+    Returns:
+        list: Lines describing objective changes and total times that changed by more than `threshold`
+    """
+    def index(report):
+        rows = {}
+        for row in report["results"]:
+            if not row["error"]:
+                # with repeated runs the fastest one is the least noisy
+                key = (row["case"], row["solver"])
+                if key not in rows or row["total"] < rows[key]["total"]:
+                    rows[key] = row
+        return rows
+
+    before, after = index(previous), index(current)
+    lines = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        if abs(old["objective"] - new["objective"]) > 1e-6:
+            lines.append(f"{key[0]} {key[1]}: objective {old['objective']:g} -> {new['objective']:g}")
+        ratio = new["total"] / old["total"] if old["total"] else 1.0
+        if abs(ratio - 1.0) > threshold:
+            lines.append(f"{key[0]} {key[1]}: total {old['total']:.3f}s -> {new['total']:.3f}s ({ratio:.2f}x)")
+    return lines
+
+
+def write_report(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
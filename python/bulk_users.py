@@ -0,0 +1,253 @@
+import hashlib
+import os
+import secrets
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# largest batch accepted by import_users and delete_users
+BATCH_SIZE = 1000
+
+# largest number of identifiers accepted by get_users
+LOOKUP_BATCH_SIZE = 100
+
+# shortest password create_user accepts
+MIN_PASSWORD_LENGTH = 6
+
+# maximum number of entries in one bulk request
+MAX_BULK_USERS = int(os.environ.get("MAX_BULK_USERS", 10000))
+
+# Admin API calls running at the same time
+BULK_CONCURRENCY = int(os.environ.get("BULK_CONCURRENCY", 4))
+
+# scrypt parameters for passwords of imported users (OWASP: N=2^14, r=8, p=5 uses 16 MiB per hash).
+# Firebase caps PBKDF2-SHA256 imports at 120000 rounds, far below current guidance, so scrypt is used
+SCRYPT_COST = int(os.environ.get("SCRYPT_COST", 2 ** 14))
+SCRYPT_BLOCK_SIZE = int(os.environ.get("SCRYPT_BLOCK_SIZE", 8))
+SCRYPT_PARALLELIZATION = int(os.environ.get("SCRYPT_PARALLELIZATION", 5))
+SCRYPT_KEY_LENGTH = 64
+
+
+def chunks(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _create_error(entry):
+    """
+    The checks create_user applies to a new account, import_users skips them
+
+    Returns:
+        str: The reason the entry is rejected, None if it is valid
+    """
+    email = entry.get("email")
+    if not isinstance(email, str) or email.count("@") != 1 or not all(email.split("@")):
+        return f"Malformed email address: {email}"
+    password = entry.get("password")
+    if password is not None and (not isinstance(password, str) or len(password) < MIN_PASSWORD_LENGTH):
+        return f"Invalid password string. Password must be a string at least {MIN_PASSWORD_LENGTH} characters long."
+    display_name = entry.get("display_name")
+    if display_name is not None and (not isinstance(display_name, str) or not display_name):
+        return "Display name must be a non-empty string."
+    return None
+
+
+def _existing_emails(auth, emails):
+    # import_users does not check that an email is unused, look the accounts up first
+    result = auth.get_users([auth.EmailIdentifier(email) for email in emails])
+    return {user.email.lower() for user in result.users if user.email}
+
+
+def _import_chunk(auth, entries):
+    """
+    Create a chunk of users with one import_users call
+
+    import_users only accepts hashed passwords, so every password is hashed
+    with standard scrypt and its own salt, Firebase verifies it on sign-in.
+    """
+    records = []
+    for entry in entries:
+        password_hash = password_salt = None
+        if entry.get("password"):
+            password_salt = secrets.token_bytes(16)
+            password_hash = hashlib.scrypt(
+                entry["password"].encode("utf-8"),
+                salt=password_salt,
+                n=SCRYPT_COST,
+                r=SCRYPT_BLOCK_SIZE,
+                p=SCRYPT_PARALLELIZATION,
+                maxmem=256 * SCRYPT_COST * SCRYPT_BLOCK_SIZE,
+                dklen=SCRYPT_KEY_LENGTH,
+            )
+        records.append(auth.ImportUserRecord(
+            uid=uuid.uuid4().hex,
+            email=entry.get("email"),
+            display_name=entry.get("display_name"),
+            disabled=bool(entry.get("disabled", False)),
+            password_hash=password_hash,
+            password_salt=password_salt,
+        ))
+
+    result = auth.import_users(
+        records,
+        hash_alg=auth.UserImportHash.standard_scrypt(
+            memory_cost=SCRYPT_COST,
+            parallelization=SCRYPT_PARALLELIZATION,
+            block_size=SCRYPT_BLOCK_SIZE,
+            derived_key_length=SCRYPT_KEY_LENGTH,
+        ),
+    )
+    errors = {error.index: error.reason for error in result.errors}
+    return [
+        {
+            "index": i,
+            "action": "create",
+            "email": record.email,
+            "uid": None if i in errors else record.uid,
+            "success": i not in errors,
+            "error": errors.get(i),
+        }
+        for i, record in enumerate(records)
+    ]
+
+
+def _delete_chunk(auth, uids):
+    result = auth.delete_users(uids)
+    errors = {error.index: error.reason for error in result.errors}
+    return [
+        {
+            "index": i,
+            "action": "delete",
+            "uid": uid,
+            "success": i not in errors,
+            "error": errors.get(i),
+        }
+        for i, uid in enumerate(uids)
+    ]
+
+
+def _update_one(auth, index, entry):
+    # the Admin SDK has no batch update, every account is updated on its own
+    try:
+        auth.update_user(entry["uid"], disabled=entry["action"] == "disable")
+        return {"index": index, "action": entry["action"], "uid": entry["uid"], "success": True, "error": None}
+    except Exception as e:
+        return {"index": index, "action": entry["action"], "uid": entry.get("uid"), "success": False, "error": str(e)}
+
+
+def bulk_users(entries, auth):
+    """
+    Create, disable, enable or delete many users with the Admin SDK batch APIs
+
+    import_users neither checks that an email is unused nor applies the
+    password rules of create_user, so creates are checked here first: emails
+    used twice in the request or by an existing account and passwords
+    shorter than MIN_PASSWORD_LENGTH fail without being imported.
+
+    Args:
+        entries: [{action: "create", email, password, display_name?}
+                  | {action: "disable" | "enable" | "delete", uid}]
+        auth: The firebase_admin.auth module or a stand-in with the same functions
+
+    Returns:
+        list: One result {index, action, uid, success, error} per entry, in request order
+    """
+    results = [None] * len(entries)
+    creates, deletes, updates = [], [], []
+    for index, entry in enumerate(entries):
+        action = entry.get("action") if isinstance(entry, dict) else None
+        if action == "create" and entry.get("email"):
+            error = _create_error(entry)
+            if error is not None:
+                results[index] = {
+                    "index": index, "action": action, "email": entry["email"], "uid": None, "success": False, "error": error,
+                }
+            else:
+                creates.append((index, entry))
+        elif action == "delete" and entry.get("uid"):
+            deletes.append((index, entry["uid"]))
+        elif action in ("disable", "enable") and entry.get("uid"):
+            updates.append((index, entry))
+        else:
+            results[index] = {
+                "index": index,
+                "action": action,
+                "uid": entry.get("uid") if isinstance(entry, dict) else None,
+                "success": False,
+                "error": "Invalid entry, expected create with email or disable/enable/delete with uid",
+            }
+
+    # an email may be used by one account only, neither twice in the request nor by an existing user
+    counts = {}
+    for _, entry in creates:
+        email = entry["email"].lower()
+        counts[email] = counts.get(email, 0) + 1
+    emails = list(counts)
+    existing, lookup_errors = set(), {}
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY) as executor:
+        lookups = [
+            (chunk, executor.submit(_existing_emails, auth, chunk))
+            for chunk in chunks(emails, LOOKUP_BATCH_SIZE)
+        ]
+        for chunk, future in lookups:
+            try:
+                existing |= future.result()
+            except Exception as e:
+                # unchecked emails could belong to an account already, they fail instead of being imported
+                lookup_errors.update(dict.fromkeys(chunk, f"Could not check whether the email is in use: {e}"))
+    unique = []
+    for index, entry in creates:
+        email = entry["email"].lower()
+        if email in lookup_errors:
+            results[index] = {
+                "index": index,
+                "action": "create",
+                "email": entry["email"],
+                "uid": None,
+                "success": False,
+                "error": lookup_errors[email],
+            }
+        elif counts[email] > 1 or email in existing:
+            results[index] = {
+                "index": index,
+                "action": "create",
+                "email": entry["email"],
+                "uid": None,
+                "success": False,
+                "error": "Email is used more than once in this request" if counts[email] > 1
+                else "The user with the provided email already exists",
+            }
+        else:
+            unique.append((index, entry))
+    creates = unique
+
+    def place(chunk_results, positions):
+        # results of a chunk are indexed within the chunk, map them back to the request
+        for result, index in zip(chunk_results, positions):
+            result["index"] = index
+            results[index] = result
+
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY) as executor:
+        futures = []
+        for chunk in chunks(creates):
+            futures.append((executor.submit(_import_chunk, auth, [e for _, e in chunk]), [i for i, _ in chunk], "create"))
+        for chunk in chunks(deletes):
+            futures.append((executor.submit(_delete_chunk, auth, [uid for _, uid in chunk]), [i for i, _ in chunk], "delete"))
+        for index, entry in updates:
+            futures.append((executor.submit(_update_one, auth, index, entry), [index], None))
+
+        for future, positions, action in futures:
+            try:
+                chunk_results = future.result()
+                place(chunk_results if isinstance(chunk_results, list) else [chunk_results], positions)
+            except Exception as e:
+                # a failed batch call fails every entry of its chunk
+                for index in positions:
+                    results[index] = {
+                        "index": index,
+                        "action": action,
+                        "uid": entries[index].get("uid"),
+                        "success": False,
+                        "error": str(e),
+                    }
+
+    return results
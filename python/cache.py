@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from solver import DEFAULT_POINTS
+
+# bounds of the assignment result cache, a TTL of 0 keeps entries until they are evicted
+CACHE_MAX_ENTRIES = int(os.environ.get("ASSIGN_CACHE_ENTRIES", 64))
+CACHE_MAX_BYTES = int(os.environ.get("ASSIGN_CACHE_BYTES", 64 * 1024 * 1024))
+CACHE_TTL = float(os.environ.get("ASSIGN_CACHE_TTL", 0))
+
+
+def assignment_key(preferences, projects, solver, options):
+    """
+    Canonical hash of everything that determines the result of an assignment
+
+    Missing points are replaced by the default points, so a payload with
+    and without explicit default points maps to the same entry.
+    """
+    canonical = {
+        "projects": {
+            str(project_id): int(project["max"]) for project_id, project in projects.items()
+        },
+        "preferences": {
+            str(student_id): [
+                [str(project_id) for project_id in student["selected"]],
+                student.get("points", DEFAULT_POINTS),
+            ]
+            for student_id, student in preferences.items()
+        },
+        "solver": solver,
+        "options": options,
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate size in bytes
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[2] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, size, time.monotonic())
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        """
+        Returns:
+            int: Number of removed entries
+        """
+        with self.lock:
+            count = len(self.entries)
+            self.entries.clear()
+            self.size = 0
+            return count
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+
+assignment_cache = ResultCache()
@@ -0,0 +1,42 @@
+import os
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+# continue the unfinished mailings when gunicorn (gunicorn.conf.py) or `python assign.py` starts
+RESUME_ON_START = _flag("RESUME_MAILINGS", "1")
+
+
+class Config:
+    """
+    Defaults of create_app(), read from the environment; create_app(config) overrides single keys
+    """
+
+    # address of the development server and of gunicorn (gunicorn.conf.py)
+    HOST = os.environ.get("ASSIGN_HOST", "ec2-13-48-226-69.eu-north-1.compute.amazonaws.com")
+    PORT = int(os.environ.get("ASSIGN_PORT", 5175))
+
+    # gunicorn worker processes and threads per worker, the development server only uses threads
+    WEB_WORKERS = int(os.environ.get("WEB_WORKERS", 2))
+    WEB_THREADS = int(os.environ.get("WEB_THREADS", 4))
+
+    # service account the Firebase Admin SDK is initialized with on first use
+    SERVICE_ACCOUNT = os.environ.get("FIREBASE_SERVICE_ACCOUNT", "waldorfwahlen-service-account.json")
+
+    # load Firebase, PuLP and smtplib in create_app() instead of on the first request
+    WARM_UP = _flag("ASSIGN_WARM_UP", "0")
+
+    # continue the unfinished mailings of the queue when the app is created; off so that importing
+    # assign opens no SQLite file, the servers resume them on start instead (RESUME_ON_START)
+    RESUME_MAILINGS = False
+
+    # back ends, None = the defaults:
+    # AUTH_BACKEND: object with `auth` and `app_check` like the firebase_admin modules and a
+    #               `firestore` client (backends.FirebaseBackend)
+    # SOLVE: function with the signature of decompose.solve_decomposed()
+    # SOLVER_EXECUTOR: function returning the executor for solves (jobs.get_executor), or None to solve in the request
+    AUTH_BACKEND = None
+    SOLVE = None
+    SOLVER_EXECUTOR = None
@@ -0,0 +1,160 @@
+import os
+import time
+
+from solver import solve_assignment
+
+# below this number of choices the components are solved one after another in-process
+MIN_PARALLEL_CHOICES = int(os.environ.get("ASSIGN_MIN_PARALLEL_CHOICES", 2000))
+
+# seconds a component still gets once the time limit of the request is used up
+MIN_COMPONENT_TIME_LIMIT = float(os.environ.get("ASSIGN_MIN_COMPONENT_TIME_LIMIT", 0.5))
+
+
+def split_components(preferences, projects):
+    """
+    Split an election into the connected components of its student <-> project choice graph
+
+    Students of different components never compete for a project, so every
+    component can be solved on its own. Projects nobody selected belong to
+    no component, they cannot be overbooked anyway.
+
+    Returns:
+        list: [(preferences, projects), ...] per component, largest first
+    """
+    parent = {}
+
+    def find(project_id):
+        while parent[project_id] != project_id:
+            parent[project_id] = parent[parent[project_id]]
+            project_id = parent[project_id]
+        return project_id
+
+    # union-find over the projects, every student joins the projects they selected
+    roots = {}
+    for student_id, student in preferences.items():
+        selected = [str(project_id) for project_id in student["selected"]]
+        for project_id in selected:
+            if project_id not in projects:
+                raise KeyError(project_id)
+            parent.setdefault(project_id, project_id)
+        if not selected:
+            # a student without choices is its own (infeasible) component
+            roots[student_id] = ("student", student_id)
+            continue
+        root = find(selected[0])
+        for project_id in selected[1:]:
+            other = find(project_id)
+            if other != root:
+                parent[other] = root
+        roots[student_id] = root
+
+    components = {}
+    for student_id, student in preferences.items():
+        root = roots[student_id]
+        if isinstance(root, str):
+            root = find(root)
+        components.setdefault(root, ({}, {}))[0][student_id] = student
+    for project_id, project in projects.items():
+        if project_id in parent:
+            components[find(project_id)][1][project_id] = project
+
+    return sorted(components.values(), key=lambda component: -len(component[0]))
+
+
+def merge_results(results, started):
+    """
+    Combine the results of independent components into one result
+    """
+    solution = {}
+    for result in results:
+        solution.update(result["solution"])
+    gaps = [result["gap"] for result in results]
+    return {
+        "solution": solution,
+        # every component runs on the same backend, including a fallback
+        "solver": results[0].get("solver"),
+        "status": "optimal" if all(r["status"] == "optimal" for r in results) else "feasible",
+        "objective": sum(result["objective"] for result in results),
+        # the relative gap of the sum is at most the largest gap of a component
+        "gap": None if None in gaps else max(gaps, default=0.0),
+        "time": time.perf_counter() - started,
+        # summed over the components, parallel components overlap in time
+        "phases": {
+            phase: sum(result["phases"].get(phase, 0.0) for result in results)
+            for phase in ("build", "solve", "extract")
+            if any(phase in result["phases"] for result in results)
+        },
+        "state": {"assignment": solution},
+        "components": [
+            {
+                "students": len(result["solution"]),
+                "status": result["status"],
+                "objective": result["objective"],
+                "time": result["time"],
+            }
+            for result in results
+        ],
+    }
+
+
+def component_options(options, deadline, share=1):
+    """
+    Options of one component: its share of the time left until the deadline (time.time())
+    """
+    remaining = (deadline - time.time()) / share
+    return {**options, "time_limit": max(remaining, MIN_COMPONENT_TIME_LIMIT)}
+
+
+def _solve_component(preferences, projects, solver, options, deadline, start):
+    # runs in a pool worker, the time left is measured when the component actually starts
+    return solve_assignment(
+        preferences, projects, solver, component_options(options, deadline), None, start
+    )
+
+
+def solve_decomposed(
+    preferences, projects, solver, options, progress=None, start=None, executor=None
+):
+    """
+    Solve an election component by component
+
+    MIP backends get one problem per connected component; with an executor
+    and enough choices the components are solved in parallel. The flow
+    backend solves the whole network at once, its searches only touch the
+    component they start in anyway. All components share the time limit of
+    the options: one after another each gets its share of the time left,
+    in parallel each gets the time left when it starts.
+
+    Args:
+        executor: Optional concurrent.futures executor for the components
+
+    Returns:
+        dict: Same as solve_assignment(), plus components: [{students, status, objective, time}]
+              if the election was split
+    """
+    if solver == "flow":
+        return solve_assignment(preferences, projects, solver, options, progress, start)
+
+    started = time.perf_counter()
+    components = split_components(preferences, projects)
+    if len(components) <= 1:
+        return solve_assignment(preferences, projects, solver, options, progress, start)
+
+    deadline = time.time() + options["time_limit"]
+    choices = sum(len(student["selected"]) for student in preferences.values())
+    if executor is None or choices < MIN_PARALLEL_CHOICES:
+        results = [
+            solve_assignment(
+                component[0], component[1], solver,
+                component_options(options, deadline, len(components) - index), progress, start,
+            )
+            for index, component in enumerate(components)
+        ]
+    else:
+        futures = [
+            executor.submit(_solve_component, component[0], component[1], solver, options, deadline, start)
+            for component in components
+        ]
+        results = [future.result() for future in futures]
+
+    return merge_results(results, started)
@@ -0,0 +1,176 @@
+import os
+import re
+
+from bulk_users import chunks
+from solver import DEFAULT_POINTS
+
+# documents per page when reading the choices of a vote
+FIRESTORE_PAGE_SIZE = int(os.environ.get("FIRESTORE_PAGE_SIZE", 1000))
+
+# documents per get_all call when reading the selected options
+FIRESTORE_GET_ALL_SIZE = 300
+
+# Firestore commits at most 500 writes at once
+FIRESTORE_BATCH_SIZE = 500
+
+# fields of a choice that the rules of the assign page can refer to
+RULE_FIELDS = ("grade", "listIndex", "name")
+
+
+def _int(value):
+    # like parseInt() of the frontend: leading digits count, anything else is no number
+    match = re.match(r"\s*([-+]?\d+)", str(value))
+    return int(match.group(1)) if match else None
+
+
+def rule_matches(apply, choice):
+    """
+    Whether a rule of the assign page applies to a choice
+
+    `apply` is "*" or conditions like "grade=12,listIndex=3,name=anna,selected=abc",
+    all of them have to match (same semantics as the frontend).
+    """
+    for condition in apply.split(","):
+        key, _, value = condition.partition("=")
+        if key == "grade":
+            grade, wanted = _int(choice.get("grade")), _int(value)
+            if grade is None or wanted is None or grade != wanted:
+                return False
+        elif key == "listIndex":
+            wanted = _int(value)
+            if wanted is None or choice.get("listIndex") != wanted:
+                return False
+        elif key == "selected":
+            if value not in [str(project_id) for project_id in choice.get("selected", [])]:
+                return False
+        elif key == "name":
+            if value.lower() not in str(choice.get("name", "")).lower():
+                return False
+    return True
+
+
+def choice_points(choice, rules):
+    """
+    Points of a choice, the last matching rule wins
+
+    Args:
+        choice: Data of the choice document
+        rules: [{apply: string, scores: [number, ...]}] as on the assign page
+
+    Returns:
+        list: Points for the 1st, 2nd, ... choice
+    """
+    points = DEFAULT_POINTS
+    for rule in rules:
+        if rule_matches(rule["apply"], choice):
+            points = rule["scores"]
+    return points
+
+
+def parse_rules(rules):
+    """
+    Validate the rules of a request
+
+    Raises:
+        ValueError: If a rule has no `apply` string or no list of scores
+    """
+    rules = rules or []
+    if not isinstance(rules, list):
+        raise ValueError("rules must be a list")
+    for rule in rules:
+        if not isinstance(rule, dict) or not isinstance(rule.get("apply"), str):
+            raise ValueError("every rule needs an 'apply' string")
+        scores = rule.get("scores")
+        if not isinstance(scores, list) or not all(isinstance(score, (int, float)) for score in scores):
+            raise ValueError("every rule needs a list of numeric 'scores'")
+    return rules
+
+
+def paged(query, page_size=FIRESTORE_PAGE_SIZE):
+    """
+    Documents of a query, read page by page in document id order
+
+    Every page is one request, so a large collection is not held by one
+    long-running stream and a retry only repeats the current page.
+    """
+    query = query.order_by("__name__").limit(page_size)
+    last = None
+    while True:
+        page = (query.start_after(last) if last is not None else query).get()
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+
+def load_election(db, election_id, rules=None):
+    """
+    Read a vote from Firestore in the format of /assign
+
+    The choices are read with paged queries, only with the fields the
+    solver and the rules need. The options are read with get_all, only
+    those that are selected by at least one student. Selected options
+    that do not exist (any more) are skipped together with their points.
+
+    Args:
+        db: Firestore client
+        election_id: Id of the document in /votes
+        rules: Rules for the points, see choice_points()
+
+    Returns:
+        tuple: (preferences, projects) like the body of /assign, or None if the vote does not exist
+    """
+    rules = rules or []
+    vote = db.collection("votes").document(election_id)
+    if not vote.get(field_paths=["title"]).exists:
+        return None
+
+    fields = ["selected"] + [field for field in RULE_FIELDS if any(field in rule["apply"] for rule in rules)]
+    choices = {}
+    for snapshot in paged(vote.collection("choices").select(fields)):
+        choice = snapshot.to_dict() or {}
+        choices[snapshot.id] = choice
+
+    selected = sorted({str(project_id) for choice in choices.values() for project_id in choice.get("selected", [])})
+    projects = {}
+    options = vote.collection("options")
+    for ids in chunks(selected, FIRESTORE_GET_ALL_SIZE):
+        for snapshot in db.get_all([options.document(option_id) for option_id in ids], field_paths=["title", "max"]):
+            if snapshot.exists:
+                option = snapshot.to_dict()
+                projects[snapshot.id] = {"title": option.get("title", ""), "max": option.get("max", 0)}
+
+    preferences = {}
+    for choice_id, choice in choices.items():
+        pairs = [
+            (str(project_id), points)
+            for project_id, points in zip(choice.get("selected", []), choice_points(choice, rules))
+            if str(project_id) in projects
+        ]
+        preferences[choice_id] = {
+            "selected": [project_id for project_id, _ in pairs],
+            "points": [points for _, points in pairs],
+        }
+    # options nobody selected cannot be overbooked, they are not needed for the solve
+    return preferences, dict(sorted(projects.items()))
+
+
+def write_results(db, election_id, solution):
+    """
+    Store an assignment as /votes/{id}/results/{choiceId} = {result: projectId}
+
+    Same documents as "save" on the assign page, written with batched
+    writes of at most 500 documents per commit.
+
+    Returns:
+        int: Number of documents written
+    """
+    results = db.collection("votes").document(election_id).collection("results")
+    written = 0
+    for items in chunks(list(solution.items()), FIRESTORE_BATCH_SIZE):
+        batch = db.batch()
+        for choice_id, project_id in items:
+            batch.set(results.document(str(choice_id)), {"result": str(project_id)}, merge=True)
+        batch.commit()
+        written += len(items)
+    return written
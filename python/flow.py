@@ -0,0 +1,325 @@
+import heapq
+import time
+
+# tolerance for reduced costs when points are not integers
+EPS = 1e-9
+
+
+class FlowNetwork:
+    """
+    Residual network stored as flat edge arrays
+
+    Every edge k has its reverse edge at k ^ 1, so pushing flow over an edge
+    is a matter of updating two entries of `cap`.
+    """
+
+    def __init__(self, num_nodes):
+        self.num_nodes = num_nodes
+        self.adj = [[] for _ in range(num_nodes)]
+        self.to = []
+        self.cap = []
+        self.cost = []
+
+    def add_edge(self, u, v, cap, cost):
+        k = len(self.to)
+        self.to += [v, u]
+        self.cap += [cap, 0]
+        self.cost += [cost, -cost]
+        self.adj[u].append(k)
+        self.adj[v].append(k + 1)
+        return k
+
+
+def _dijkstra(network, source, sink, potential):
+    """
+    Shortest reduced-cost distances from source in the residual network
+
+    The search stops as soon as the sink is settled, nodes that are not
+    settled by then keep a tentative distance or None.
+
+    Returns:
+        list: distance per node, None for unreached nodes
+    """
+    to, cap, cost, adj = network.to, network.cap, network.cost, network.adj
+    dist = [None] * network.num_nodes
+    dist[source] = 0
+    heap = [(0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if u == sink:
+            break
+        pu = potential[u]
+        for k in adj[u]:
+            if cap[k] <= 0:
+                continue
+            v = to[k]
+            nd = d + cost[k] + pu - potential[v]
+            if dist[v] is None or nd < dist[v] - EPS:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def _admissible_levels(network, source, sink, potential):
+    """
+    BFS levels over residual edges with zero reduced cost
+    """
+    to, cap, cost, adj = network.to, network.cap, network.cost, network.adj
+    level = [-1] * network.num_nodes
+    level[source] = 0
+    queue = [source]
+    for u in queue:
+        # nodes beyond the level of the sink are not on any shortest path
+        if level[sink] >= 0:
+            break
+        pu = potential[u]
+        for k in adj[u]:
+            v = to[k]
+            if level[v] < 0 and cap[k] > 0 and abs(cost[k] + pu - potential[v]) < EPS:
+                level[v] = level[u] + 1
+                queue.append(v)
+    return level if level[sink] >= 0 else None
+
+
+def _blocking_flow(network, source, sink, potential, level, limit):
+    """
+    Push as much flow as possible along admissible shortest paths (Dinic)
+
+    Returns:
+        int: Units of flow pushed
+    """
+    to, cap, cost, adj = network.to, network.cap, network.cost, network.adj
+    pointer = [0] * network.num_nodes
+    pushed = 0
+    while pushed < limit:
+        # iterative DFS over the level graph, remembering the edge taken at every depth
+        path = []
+        u = source
+        while u != sink:
+            edges = adj[u]
+            advanced = False
+            while pointer[u] < len(edges):
+                k = edges[pointer[u]]
+                v = to[k]
+                if (
+                    cap[k] > 0
+                    and level[v] == level[u] + 1
+                    and abs(cost[k] + potential[u] - potential[v]) < EPS
+                ):
+                    path.append(k)
+                    u = v
+                    advanced = True
+                    break
+                pointer[u] += 1
+            if not advanced:
+                if u == source:
+                    return pushed
+                # dead end: never visit this node again in this phase
+                level[u] = -1
+                k = path.pop()
+                u = to[k ^ 1]
+                pointer[u] += 1
+        amount = min(min(cap[k] for k in path), limit - pushed)
+        for k in path:
+            cap[k] -= amount
+            cap[k ^ 1] += amount
+        pushed += amount
+    return pushed
+
+
+def min_cost_flow(network, source, sink, demand, potential=None, deadline=None):
+    """
+    Send `demand` units from source to sink at minimum cost (primal-dual)
+
+    Every phase computes shortest distances with Dijkstra on reduced costs
+    and then saturates all shortest paths at once, so the number of phases
+    is bounded by the number of distinct path costs instead of the number
+    of units.
+
+    Args:
+        potential: Node potentials for which every residual edge has a
+                   non-negative reduced cost, all zero if not given (then
+                   all costs have to be non-negative). Updated in place.
+        deadline: Optional time.time() after which no further phase is started
+
+    Returns:
+        int: Units of flow actually sent
+
+    Raises:
+        TimeoutError: If the deadline passed before all units were sent
+    """
+    if potential is None:
+        potential = [0] * network.num_nodes
+    sent = 0
+    while sent < demand:
+        if deadline is not None and time.time() > deadline:
+            raise TimeoutError("No assignment found within the time limit")
+        dist = _dijkstra(network, source, sink, potential)
+        if dist[sink] is None:
+            break
+        # capping the distances at the one of the sink keeps all reduced costs non-negative
+        reach = dist[sink]
+        for v in range(network.num_nodes):
+            potential[v] += reach if dist[v] is None or dist[v] > reach else dist[v]
+        while sent < demand:
+            level = _admissible_levels(network, source, sink, potential)
+            if level is None:
+                break
+            sent += _blocking_flow(network, source, sink, potential, level, demand - sent)
+    return sent
+
+
+def flow_assignment(instance, penalty, start=None, deadline=None):
+    """
+    Solve an assignment instance as a transportation problem with min-cost flow
+
+    source -> student (1 unit) -> chosen project (points) -> sink, where every
+    project has an arc with its capacity at cost 0 and an overbooking arc at
+    cost `penalty` per seat.
+
+    With `start` the previous assignment is loaded as initial flow and the
+    previous potentials as duals. Edges whose reduced cost became negative
+    through the changes are saturated, and the resulting excesses are routed
+    along shortest paths. The reduced cost optimality conditions hold
+    throughout, so the result is optimal, and for a small diff only a few
+    units have to be moved.
+
+    Args:
+        instance: Instance created by solver.build_instance()
+        penalty: Cost per overbooked seat
+        start: Optional state returned by a previous call, may belong to a different instance;
+               ignored if it has no potentials
+        deadline: Optional time.time() by which the flow has to be found
+
+    Returns:
+        tuple: (chosen pair index per student, objective value, state for a later start)
+
+    Raises:
+        ValueError: If some student has no valid choice
+        TimeoutError: If the deadline passed before the flow was found
+    """
+    num_students = len(instance["student_keys"])
+    num_projects = len(instance["project_keys"])
+    source = num_students + num_projects
+    sink = source + 1
+    # super source and sink connect the nodes with excess or deficit of the initial flow
+    super_source = sink + 1
+    super_sink = sink + 2
+    network = FlowNetwork(sink + 3)
+
+    source_edges = [network.add_edge(source, i, 1, 0) for i in range(num_students)]
+    pair_edges = [
+        network.add_edge(i, num_students + j, 1, cost)
+        for i, j, cost in zip(
+            instance["pair_student"], instance["pair_project"], instance["pair_cost"]
+        )
+    ]
+    sink_edges = []
+    for j, capacity in enumerate(instance["capacity"]):
+        if not instance["project_pairs"][j]:
+            sink_edges.append((None, None))
+            continue
+        capacity_edge = network.add_edge(num_students + j, sink, capacity, 0) if capacity > 0 else None
+        penalty_edge = network.add_edge(num_students + j, sink, num_students, penalty)
+        sink_edges.append((capacity_edge, penalty_edge))
+
+    # points are free-form and may be negative: shifting every student by its cheapest choice
+    # makes all reduced costs non-negative, which Dijkstra relies on
+    potential = [0] * network.num_nodes
+    for i, pairs in enumerate(instance["student_pairs"]):
+        if pairs:
+            potential[i] = -min(instance["pair_cost"][k] for k in pairs)
+    potential[source] = max(potential[:num_students], default=0)
+    excess = [0] * network.num_nodes
+    excess[source] = num_students
+    excess[sink] = -num_students
+
+    def push(k, amount):
+        network.cap[k] -= amount
+        network.cap[k ^ 1] += amount
+        excess[network.to[k ^ 1]] -= amount
+        excess[network.to[k]] += amount
+
+    if start is not None and start.get("potential"):
+        previous = start["potential"]
+        potential[source] = previous["source"]
+        potential[sink] = previous["sink"]
+        for i, student_id in enumerate(instance["student_keys"]):
+            potential[i] = previous["students"].get(student_id, previous["source"])
+        for j, project_id in enumerate(instance["project_keys"]):
+            potential[num_students + j] = previous["projects"].get(project_id, previous["sink"])
+
+        # route every student that keeps a valid choice over its previous project
+        project_ids = {project_id: j for j, project_id in enumerate(instance["project_keys"])}
+        load = [0] * num_projects
+        for i, student_id in enumerate(instance["student_keys"]):
+            j = project_ids.get(start["assignment"].get(student_id))
+            for k in instance["student_pairs"][i]:
+                if instance["pair_project"][k] == j:
+                    push(source_edges[i], 1)
+                    push(pair_edges[k], 1)
+                    load[j] += 1
+                    break
+        for j, (capacity_edge, penalty_edge) in enumerate(sink_edges):
+            seats = 0
+            if capacity_edge is not None:
+                seats = min(load[j], network.cap[capacity_edge])
+                push(capacity_edge, seats)
+            if penalty_edge is not None and load[j] > seats:
+                push(penalty_edge, load[j] - seats)
+
+        # restore the optimality conditions by saturating every edge with a negative reduced cost
+        to, cap, cost = network.to, network.cap, network.cost
+        for k in range(len(to)):
+            if cap[k] > 0 and cost[k] + potential[to[k ^ 1]] - potential[to[k]] < -EPS:
+                push(k, cap[k])
+
+    surplus = [v for v in range(sink + 1) if excess[v] > 0]
+    deficit = [v for v in range(sink + 1) if excess[v] < 0]
+    demand = 0
+    for v in surplus:
+        network.add_edge(super_source, v, excess[v], 0)
+        demand += excess[v]
+    for v in deficit:
+        network.add_edge(v, super_sink, -excess[v], 0)
+    if surplus:
+        potential[super_source] = max(potential[v] for v in surplus)
+        potential[super_sink] = min(potential[v] for v in deficit)
+
+    sent = min_cost_flow(network, super_source, super_sink, demand, potential, deadline)
+    if sent < demand:
+        raise ValueError("No feasible assignment: some students have no valid choice")
+
+    chosen = [None] * num_students
+    load = [0] * num_projects
+    objective = 0
+    for k, edge in enumerate(pair_edges):
+        # a saturated pair edge carries the student's unit of flow
+        if network.cap[edge] == 0:
+            chosen[instance["pair_student"][k]] = k
+            load[instance["pair_project"][k]] += 1
+            objective += instance["pair_cost"][k]
+    objective += sum(
+        penalty * max(0, load[j] - capacity) for j, capacity in enumerate(instance["capacity"])
+    )
+
+    state = {
+        "assignment": {
+            instance["student_keys"][i]: instance["project_keys"][instance["pair_project"][k]]
+            for i, k in enumerate(chosen)
+        },
+        "potential": {
+            "source": potential[source],
+            "sink": potential[sink],
+            "students": {
+                student_id: potential[i] for i, student_id in enumerate(instance["student_keys"])
+            },
+            "projects": {
+                project_id: potential[num_students + j]
+                for j, project_id in enumerate(instance["project_keys"])
+            },
+        },
+    }
+    return chosen, objective, state
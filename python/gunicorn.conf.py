@@ -0,0 +1,23 @@
+# gunicorn settings, taken from config.Config: gunicorn -c gunicorn.conf.py
+from config import RESUME_ON_START, Config
+from logs import configure_logging
+
+# importing assign neither configures logging nor creates an app, the server does both
+configure_logging()
+wsgi_app = "assign:create_app()"
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+
+# with ASSIGN_WARM_UP the app is created once in the master and the workers are forked with
+# Firebase, PuLP and smtplib already loaded
+preload_app = Config.WARM_UP
+
+
+def post_fork(server, worker):
+    # the mail queue (SQLite connection and sending thread) must not be opened before the fork,
+    # every worker resumes the mailings itself
+    if RESUME_ON_START:
+        import mail_jobs
+
+        mail_jobs.resume()
@@ -0,0 +1,74 @@
+import os
+import threading
+from collections import OrderedDict
+
+from solver import DEFAULT_POINTS
+
+# number of elections whose last solve is kept for re-optimization
+MAX_ELECTIONS = int(os.environ.get("ASSIGN_INCREMENTAL_ELECTIONS", 32))
+
+
+def election_diff(previous, preferences, projects):
+    """
+    Count what changed between the last solved payload of an election and a new one
+
+    Returns:
+        dict: {added, removed, changed, capacities} where changed counts students with
+              different choices or points and capacities counts added, removed or
+              resized projects
+    """
+    old_preferences = previous["preferences"]
+    old_projects = previous["projects"]
+
+    def choices(student):
+        return (
+            [str(project_id) for project_id in student["selected"]],
+            list(student.get("points", DEFAULT_POINTS)),
+        )
+
+    added = sum(1 for student_id in preferences if student_id not in old_preferences)
+    removed = sum(1 for student_id in old_preferences if student_id not in preferences)
+    changed = sum(
+        1
+        for student_id, student in preferences.items()
+        if student_id in old_preferences and choices(student) != choices(old_preferences[student_id])
+    )
+    capacities = sum(
+        1
+        for project_id, project in projects.items()
+        if project_id not in old_projects or int(project["max"]) != int(old_projects[project_id]["max"])
+    ) + sum(1 for project_id in old_projects if project_id not in projects)
+
+    return {"added": added, "removed": removed, "changed": changed, "capacities": capacities}
+
+
+class ElectionStates:
+    """
+    Last solved payload and solver state per election, least recently used elections are dropped
+    """
+
+    def __init__(self, max_elections=MAX_ELECTIONS):
+        self.max_elections = max_elections
+        self.elections = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, election_id):
+        with self.lock:
+            entry = self.elections.get(election_id)
+            if entry is not None:
+                self.elections.move_to_end(election_id)
+            return entry
+
+    def put(self, election_id, preferences, projects, state):
+        with self.lock:
+            self.elections[election_id] = {
+                "preferences": preferences,
+                "projects": projects,
+                "state": state,
+            }
+            self.elections.move_to_end(election_id)
+            while len(self.elections) > self.max_elections:
+                self.elections.popitem(last=False)
+
+
+election_states = ElectionStates()
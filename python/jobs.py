@@ -0,0 +1,278 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from decompose import solve_decomposed
+
+logger = logging.getLogger(__name__)
+
+# number of solver processes, defaults to the number of cores
+MAX_WORKERS = int(os.environ.get("ASSIGN_WORKERS", os.cpu_count() or 1))
+
+# jobs that may wait for a free worker before new jobs are rejected
+MAX_QUEUED_JOBS = int(os.environ.get("ASSIGN_MAX_QUEUED_JOBS", MAX_WORKERS * 2))
+
+# optional SQLite file so finished jobs survive a worker restart
+JOB_DB = os.environ.get("ASSIGN_JOB_DB")
+
+# progress of a job per phase reported by solve_assignment()
+PHASE_PROGRESS = {"queued": 0.0, "build": 0.1, "solve": 0.3, "extract": 0.9, "done": 1.0}
+
+
+class JobStore:
+    """
+    Job records kept in memory and optionally mirrored to SQLite
+
+    A record is a dict with id, status (queued, running, done, failed),
+    phase, progress, created, finished, result, error and error_type
+    (time_limit if no assignment was found in time). Several worker
+    processes can share the SQLite file, every row remembers the process
+    that runs the job.
+    """
+
+    def __init__(self, path=None):
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, record TEXT NOT NULL, owner TEXT)"
+            )
+            if "owner" not in [column[1] for column in self.db.execute("PRAGMA table_info(jobs)")]:
+                self.db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            # jobs of processes that stopped cannot be resumed, jobs of other live workers are left alone
+            for job_id, record, owner in self.db.execute("SELECT id, record, owner FROM jobs").fetchall():
+                job = json.loads(record)
+                if job["status"] not in ("queued", "running") or _owner_alive(owner):
+                    continue
+                job.update(status="failed", error="Job was interrupted by a server restart")
+                self.db.execute(
+                    "UPDATE jobs SET record = ? WHERE id = ?", (json.dumps(job), job_id)
+                )
+            self.db.commit()
+
+    def _write(self, job):
+        # callers hold self.lock
+        self.jobs[job["id"]] = job
+        if self.db is not None:
+            self.db.execute(
+                "INSERT OR REPLACE INTO jobs (id, record, owner) VALUES (?, ?, ?)",
+                (job["id"], json.dumps(job), _owner()),
+            )
+            self.db.commit()
+
+    def put(self, job):
+        with self.lock:
+            self._write(job)
+
+    def update(self, job_id, active_only=False, **fields):
+        """
+        Merge fields into a job of this process
+
+        With active_only the job is only changed while it is queued or
+        running, checked under the same lock as the write so that a late
+        progress message cannot overwrite a finished job.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or (active_only and job["status"] not in ("queued", "running")):
+                return
+            self._write({**job, **fields})
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None and self.db is not None:
+                # the job may have been created by another worker process
+                row = self.db.execute("SELECT record FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if row is not None:
+                    job = json.loads(row[0])
+            return job
+
+
+def _owner():
+    # the process that writes the row, read on every write
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner):
+    """
+    Whether the process that owns a job row is still running
+
+    Rows without an owner and rows of this process (a reused pid) count as
+    stopped, processes on other hosts are assumed to be alive.
+    """
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    if int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Job store of this process, the SQLite file is opened on first use
+
+    Like mail_jobs.get_queue(), so with gunicorn's preload_app no connection
+    is created in the master and inherited by the forked workers.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore(JOB_DB)
+        return _store
+
+_executor = None
+_executor_lock = threading.Lock()
+_progress_queue = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_assignment(job_id, preferences, projects, solver, options, start):
+    """
+    Solve one job inside a worker process and report the phases to the parent
+    """
+    return solve_decomposed(
+        preferences,
+        projects,
+        solver,
+        options,
+        progress=lambda phase: _progress_queue.put((job_id, phase)),
+        start=start,
+    )
+
+
+def _listen_progress(progress_queue):
+    while True:
+        job_id, phase = progress_queue.get()
+        # a late progress message must not reset a finished job
+        get_store().update(job_id, active_only=True, status="running", phase=phase, progress=PHASE_PROGRESS[phase])
+
+
+def get_executor():
+    """
+    Process pool shared by assignment jobs and the components of synchronous solves
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            progress_queue = multiprocessing.Queue()
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, initializer=_init_worker, initargs=(progress_queue,)
+            )
+            threading.Thread(target=_listen_progress, args=(progress_queue,), daemon=True).start()
+        return _executor
+
+
+def _finish(job_id, future, on_result):
+    with _pending_lock:
+        _pending.discard(job_id)
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.warning("Assignment job failed: %s", e, extra={"fields": {"job_id": job_id}})
+        get_store().update(
+            job_id,
+            status="failed",
+            error=str(e),
+            error_type="time_limit" if isinstance(e, TimeoutError) else "solve_failed",
+            finished=time.time(),
+        )
+        return
+    if on_result is not None:
+        on_result(result)
+    get_store().update(
+        job_id,
+        status="done",
+        phase="done",
+        progress=1.0,
+        finished=time.time(),
+        result=result["solution"],
+        # the backend that actually ran, highs falls back to cbc without highspy
+        **({"solver": result["solver"]} if result.get("solver") else {}),
+        solver_status=result["status"],
+        objective=result["objective"],
+        gap=result["gap"],
+        time=result["time"],
+        components=result.get("components"),
+    )
+
+
+def submit_assignment(preferences, projects, solver, options, on_result=None, start=None):
+    """
+    Queue an assignment job on the process pool
+
+    Args:
+        on_result: Optional callback, called with the result of solve_assignment() when the job is done
+        start: Optional state of a previous solve to re-optimize from
+
+    Returns:
+        str: The id of the job, or None if the pool and its queue are full
+    """
+    with _pending_lock:
+        if len(_pending) >= MAX_WORKERS + MAX_QUEUED_JOBS:
+            return None
+        job_id = uuid.uuid4().hex
+        _pending.add(job_id)
+
+    get_store().put({
+        "id": job_id,
+        "status": "queued",
+        "phase": "queued",
+        "progress": 0.0,
+        "solver": solver,
+        "created": time.time(),
+        "finished": None,
+        "result": None,
+        "error": None,
+        "error_type": None,
+    })
+    future = get_executor().submit(
+        _run_assignment, job_id, preferences, projects, solver, options, start
+    )
+    future.add_done_callback(lambda f: _finish(job_id, f, on_result))
+    return job_id
+
+
+def get_job(job_id):
+    """
+    Returns:
+        dict: The job record, or None if there is no job with this id
+    """
+    return get_store().get(job_id)
+
+
+def active_jobs():
+    """
+    Returns:
+        int: Number of jobs that are queued or running in this process
+    """
+    with _pending_lock:
+        return len(_pending)
@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+
+# level of the application loggers: DEBUG, INFO, WARNING, ...
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# "json" for one JSON object per line, "text" for readable lines during development
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record, the `fields` passed as extra become keys of the object
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", {})
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """
+    Send the records of all loggers to stderr in the configured format
+
+    A handler that is already installed (e.g. by gunicorn) is kept.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        if log_format == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        root.addHandler(handler)
+    root.setLevel(level)
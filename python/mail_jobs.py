@@ -0,0 +1,425 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from mailer import check_mailing, compile_message, open_connection, open_pool, render_message, send_message
+
+logger = logging.getLogger(__name__)
+
+# SQLite file with the queued mailings, a restarted worker resumes from it. It holds the SMTP
+# configuration of every unfinished mailing including the password in plain text, so it must be an
+# absolute path outside the served and versioned files; the default is the instance directory
+MAIL_JOB_DB = os.environ.get(
+    "MAIL_JOB_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "mail_jobs.db")
+)
+
+# attempts per recipient before a transient error counts as final
+MAIL_MAX_ATTEMPTS = int(os.environ.get("MAIL_MAX_ATTEMPTS", 5))
+
+# seconds before the first retry, doubled with every further attempt
+MAIL_RETRY_DELAY = float(os.environ.get("MAIL_RETRY_DELAY", 30))
+MAIL_RETRY_MAX_DELAY = float(os.environ.get("MAIL_RETRY_MAX_DELAY", 3600))
+
+# seconds a worker owns a mailing without reporting progress before another worker may take it over
+MAIL_LEASE = float(os.environ.get("MAIL_LEASE", 120))
+
+# longest sleep of the worker between two looks at the queue
+MAIL_POLL_INTERVAL = float(os.environ.get("MAIL_POLL_INTERVAL", 5))
+
+# errors of send_message() worth another attempt, a refused recipient stays refused
+RETRY_ERRORS = ("send_failed", "data_error")
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff: seconds to wait after the given number of failed attempts
+    """
+    return min(MAIL_RETRY_DELAY * 2 ** (attempts - 1), MAIL_RETRY_MAX_DELAY)
+
+
+class MailQueue:
+    """
+    Mailings and the state of every recipient in a SQLite file
+
+    A recipient is marked sent right after the server accepted the message,
+    so a restarted worker only sends to recipients that are still pending.
+    Several worker processes can share the file, a mailing is processed by
+    the worker holding its lease. The SMTP configuration, password included,
+    is stored with the mailing while it has pending recipients and cleared
+    when it finishes; the file is only readable by the owner.
+    """
+
+    def __init__(self, path):
+        if not os.path.isabs(path):
+            raise ValueError(f"MAIL_JOB_DB must be an absolute path, got '{path}'")
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        # created before SQLite opens it, so the stored credentials are never readable by others
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS mail_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                finished REAL,
+                error TEXT,
+                smtp_config TEXT,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                lease_owner TEXT,
+                lease_until REAL
+            );
+            CREATE TABLE IF NOT EXISTS mail_recipients (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                email TEXT NOT NULL,
+                variables TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                error TEXT,
+                error_type TEXT,
+                PRIMARY KEY (job_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS mail_recipients_pending
+                ON mail_recipients (status, next_attempt);
+            """
+        )
+
+    def add(self, smtp_config, subject, body, recipient_emails, recipient_variables):
+        job_id = uuid.uuid4().hex
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT INTO mail_jobs (id, status, created, smtp_config, subject, body) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, time.time(), json.dumps(smtp_config), subject, body),
+            )
+            self.db.executemany(
+                "INSERT INTO mail_recipients (job_id, position, email, variables, status) "
+                "VALUES (?, ?, ?, ?, 'pending')",
+                [
+                    (job_id, position, email, None if variables is None else json.dumps(variables))
+                    for position, (email, variables) in enumerate(zip(recipient_emails, recipient_variables))
+                ],
+            )
+        return job_id
+
+    def claim(self, owner):
+        """
+        Take the lease of the oldest mailing with recipients that are due
+
+        Returns:
+            str: The id of the mailing, None if nothing is due
+        """
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                """
+                UPDATE mail_jobs SET lease_owner = ?, lease_until = ?, status = 'running'
+                WHERE id = (
+                    SELECT id FROM mail_jobs
+                    WHERE status IN ('queued', 'running')
+                      AND (lease_until IS NULL OR lease_until < ?)
+                      AND EXISTS (
+                          SELECT 1 FROM mail_recipients
+                          WHERE job_id = mail_jobs.id AND status = 'pending' AND next_attempt <= ?
+                      )
+                    ORDER BY created LIMIT 1
+                )
+                """,
+                (owner, now + MAIL_LEASE, now, now),
+            )
+            row = self.db.execute(
+                "SELECT id FROM mail_jobs WHERE lease_owner = ? AND status = 'running'", (owner,)
+            ).fetchone()
+        return row["id"] if row else None
+
+    def job(self, job_id):
+        with self.lock:
+            return self.db.execute("SELECT * FROM mail_jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def due(self, job_id):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT position, email, variables FROM mail_recipients "
+                "WHERE job_id = ? AND status = 'pending' AND next_attempt <= ? ORDER BY position",
+                (job_id, time.time()),
+            ).fetchall()
+        return [
+            (row["position"], row["email"], None if row["variables"] is None else json.loads(row["variables"]))
+            for row in rows
+        ]
+
+    def record(self, job_id, position, owner, error=None):
+        """
+        Store the outcome of one attempt and extend the lease of the mailing
+
+        Args:
+            error: The failed_emails entry of send_message(), None if the message was sent
+        """
+        now = time.time()
+        with self.lock, self.db:
+            if error is None:
+                self.db.execute(
+                    "UPDATE mail_recipients SET status = 'sent', attempts = attempts + 1, "
+                    "error = NULL, error_type = NULL WHERE job_id = ? AND position = ?",
+                    (job_id, position),
+                )
+            else:
+                attempts = self.db.execute(
+                    "SELECT attempts FROM mail_recipients WHERE job_id = ? AND position = ?",
+                    (job_id, position),
+                ).fetchone()["attempts"] + 1
+                retry = error.get("error_type") in RETRY_ERRORS and attempts < MAIL_MAX_ATTEMPTS
+                self.db.execute(
+                    "UPDATE mail_recipients SET status = ?, attempts = ?, next_attempt = ?, "
+                    "error = ?, error_type = ? WHERE job_id = ? AND position = ?",
+                    (
+                        "pending" if retry else "failed",
+                        attempts,
+                        now + retry_delay(attempts) if retry else now,
+                        error["error"],
+                        error["error_type"],
+                        job_id,
+                        position,
+                    ),
+                )
+            self.db.execute(
+                "UPDATE mail_jobs SET lease_until = ? WHERE id = ? AND lease_owner = ?",
+                (now + MAIL_LEASE, job_id, owner),
+            )
+
+    def fail(self, job_id, error):
+        """
+        Give up a mailing, e.g. after the server rejected the credentials
+        """
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE mail_recipients SET status = 'failed', error = ?, error_type = 'job_failed' "
+                "WHERE job_id = ? AND status = 'pending'",
+                (error, job_id),
+            )
+            self.db.execute("UPDATE mail_jobs SET error = ? WHERE id = ?", (error, job_id))
+
+    def release(self, job_id):
+        """
+        Return the lease of a mailing, a mailing without pending recipients is finished
+        """
+        with self.lock, self.db:
+            pending = self.db.execute(
+                "SELECT COUNT(*) FROM mail_recipients WHERE job_id = ? AND status = 'pending'",
+                (job_id,),
+            ).fetchone()[0]
+            if pending:
+                self.db.execute(
+                    "UPDATE mail_jobs SET lease_owner = NULL, lease_until = NULL WHERE id = ?",
+                    (job_id,),
+                )
+            else:
+                # the credentials are only kept while they are needed
+                self.db.execute(
+                    "UPDATE mail_jobs SET status = CASE WHEN error IS NULL THEN 'done' ELSE 'failed' END, "
+                    "finished = ?, smtp_config = NULL, lease_owner = NULL, lease_until = NULL WHERE id = ?",
+                    (time.time(), job_id),
+                )
+
+    def next_attempt(self):
+        """
+        Returns:
+            float: Earliest time a pending recipient of any mailing is due, None if nothing is pending
+        """
+        with self.lock:
+            return self.db.execute(
+                "SELECT MIN(next_attempt) FROM mail_recipients WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def active(self):
+        """
+        Returns:
+            int: Number of mailings that are queued or running
+        """
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM mail_jobs WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    def progress(self, job_id):
+        """
+        Returns:
+            dict: {id, status, created, finished, error, total, sent, failed, pending,
+                  next_attempt, failed_emails}, None if there is no mailing with this id
+        """
+        with self.lock:
+            job = self.db.execute("SELECT * FROM mail_jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(self.db.execute(
+                "SELECT status, COUNT(*) FROM mail_recipients WHERE job_id = ? GROUP BY status",
+                (job_id,),
+            ).fetchall())
+            next_attempt = self.db.execute(
+                "SELECT MIN(next_attempt) FROM mail_recipients WHERE job_id = ? AND status = 'pending'",
+                (job_id,),
+            ).fetchone()[0]
+            failed = self.db.execute(
+                "SELECT email, error, error_type, attempts FROM mail_recipients "
+                "WHERE job_id = ? AND status = 'failed' ORDER BY position",
+                (job_id,),
+            ).fetchall()
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "created": job["created"],
+            "finished": job["finished"],
+            "error": job["error"],
+            "total": sum(counts.values()),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "pending": counts.get("pending", 0),
+            "next_attempt": next_attempt,
+            "failed_emails": [dict(row) for row in failed],
+        }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def get_queue():
+    """
+    Queue of this process, the SQLite file is opened on first use
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = MailQueue(MAIL_JOB_DB)
+        return _queue
+
+
+def _send_due(job_id, owner):
+    """
+    One pass over the recipients of a mailing that are due now
+    """
+    job = get_queue().job(job_id)
+    recipients = get_queue().due(job_id)
+    if not recipients:
+        return
+    smtp_config = json.loads(job["smtp_config"])
+    from_address = smtp_config.get("from_address", smtp_config["username"])
+
+    server, error = open_connection(smtp_config)
+    if error is not None:
+        if error["error_type"] == "connection_failed":
+            # the server may be back later, every due recipient waits for its next attempt
+            for position, _, _ in recipients:
+                get_queue().record(job_id, position, owner, {"error": error["message"], "error_type": "send_failed"})
+        else:
+            logger.warning("Mailing failed", extra={"fields": {"job_id": job_id, "error_type": error["error_type"]}})
+            get_queue().fail(job_id, error["message"])
+        return
+
+    pool, limiter = open_pool(smtp_config, server)
+    compiled = compile_message(from_address, job["subject"], job["body"])
+
+    def send(recipient):
+        position, email, variables = recipient
+        text = render_message(compiled, email, variables)
+        limiter.wait()
+        get_queue().record(job_id, position, owner, send_message(pool, from_address, email, text))
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            list(executor.map(send, recipients))
+    finally:
+        pool.close()
+
+
+def _work():
+    owner = uuid.uuid4().hex
+    while True:
+        job_id = get_queue().claim(owner)
+        if job_id is None:
+            due = get_queue().next_attempt()
+            timeout = MAIL_POLL_INTERVAL if due is None else min(MAIL_POLL_INTERVAL, max(due - time.time(), 0.01))
+            _wake.wait(timeout)
+            _wake.clear()
+            continue
+        try:
+            _send_due(job_id, owner)
+        except Exception as e:
+            logger.exception("Mailing failed", extra={"fields": {"job_id": job_id}})
+            get_queue().fail(job_id, f"Unexpected error occurred while sending emails: {str(e)}")
+        finally:
+            get_queue().release(job_id)
+
+
+def start_worker():
+    """
+    Start the background thread that sends queued mailings, once per process
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, daemon=True)
+            _worker.start()
+    _wake.set()
+
+
+def submit_mailing(recipient_emails, subject, body, smtp_config, recipient_variables=None):
+    """
+    Queue a mailing for the background worker
+
+    Args:
+        Same as mailer.send_email()
+
+    Returns:
+        tuple: (job id, None) or (None, error response of send_email()) if the mailing is invalid
+    """
+    if isinstance(recipient_emails, str):
+        recipient_emails = [recipient_emails]
+    error = check_mailing(recipient_emails, smtp_config)
+    if error is not None:
+        return None, error
+    if recipient_variables is None:
+        recipient_variables = [None] * len(recipient_emails)
+    job_id = get_queue().add(smtp_config, subject, body, recipient_emails, recipient_variables)
+    start_worker()
+    return job_id, None
+
+
+def get_mailing(job_id):
+    """
+    Returns:
+        dict: Progress of the mailing, None if there is no mailing with this id
+    """
+    return get_queue().progress(job_id)
+
+
+def active_mailings():
+    """
+    Returns:
+        int: Number of mailings that are queued or running in any worker process
+    """
+    return get_queue().active()
+
+
+def resume():
+    """
+    Start the worker if the queue holds unfinished mailings, e.g. after a restart
+    """
+    if get_queue().next_attempt() is not None:
+        start_worker()
+
@@ -0,0 +1,518 @@
+import base64
+import math
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.header import Header
+from email.utils import formataddr, parseaddr
+
+# {{variable_name}} placeholders of mail templates
+PLACEHOLDER = re.compile(r"\{\{(.*?)\}\}")
+
+# maximum number of SMTP connections used for one mailing
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", 4))
+
+# messages sent over one connection before it is replaced, 0 = no limit
+SMTP_MESSAGES_PER_CONNECTION = int(os.environ.get("SMTP_MESSAGES_PER_CONNECTION", 0))
+
+# messages per second over all connections, 0 = no limit
+SMTP_RATE_LIMIT = float(os.environ.get("SMTP_RATE_LIMIT", 0))
+
+
+class SMTPPool:
+    """
+    Bounded pool of logged in STARTTLS connections to one SMTP server
+
+    Connections are opened lazily up to `size`. A connection that was
+    dropped by the server is discarded and replaced on the next acquire,
+    after `max_messages` messages a connection is closed and replaced too.
+    If the server refuses an additional connection, `size` shrinks to the
+    connections already open and callers wait for one of those instead.
+    """
+
+    def __init__(self, smtp_config, size, max_messages=0):
+        self.smtp_config = smtp_config
+        self.size = size
+        self.max_messages = max_messages
+        self.idle = queue.LifoQueue()
+        self.open = 0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        import smtplib
+
+        server = smtplib.SMTP(self.smtp_config['server'], int(self.smtp_config['port']))
+        server.starttls()
+        server.login(self.smtp_config['username'], self.smtp_config['password'])
+        return server
+
+    def add(self, server):
+        with self.lock:
+            self.open += 1
+        self.idle.put([server, 0])
+
+    def acquire(self):
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                create = self.open < self.size
+                if create:
+                    self.open += 1
+            if create:
+                try:
+                    return [self.connect(), 0]
+                except Exception:
+                    with self.lock:
+                        self.open -= 1
+                        # many servers allow only a few connections per account,
+                        # keep going with the ones that are already open
+                        working = self.open
+                        if working > 0:
+                            self.size = min(self.size, working)
+                    if working == 0:
+                        raise
+            # all connections are busy, wait for one to come back or to be discarded
+            try:
+                return self.idle.get(timeout=0.05)
+            except queue.Empty:
+                continue
+
+    def release(self, connection):
+        connection[1] += 1
+        if self.max_messages and connection[1] >= self.max_messages:
+            self.discard(connection)
+        else:
+            self.idle.put(connection)
+
+    def discard(self, connection):
+        try:
+            connection[0].quit()
+        except Exception:
+            pass
+        with self.lock:
+            self.open -= 1
+
+    def close(self):
+        while True:
+            try:
+                self.discard(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class RateLimiter:
+    """
+    Spaces calls to wait() evenly so that at most `rate` calls per second pass
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next, now)
+            self.next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def compile_template(template):
+    """
+    Split a template with {{variable_name}} placeholders into literals and names
+
+    Returns:
+        list: [literal, name, literal, name, ..., literal]
+    """
+    return PLACEHOLDER.split(template)
+
+
+def render_template(compiled, variables):
+    """
+    Fill a compiled template in a single pass, unknown placeholders are kept as they are
+    """
+    parts = list(compiled)
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        parts[i] = str(variables[name]) if name in variables else f"{{{{{name}}}}}"
+    return "".join(parts)
+
+
+def encode_subject(subject):
+    # line breaks from variables must not start a new header
+    subject = " ".join(subject.splitlines())
+    return Header(subject, 'utf-8').encode() if not subject.isascii() else subject
+
+
+def encode_address(address):
+    # display names like "Schule Müller" are encoded per RFC 2047, smtplib only sends ASCII
+    if address.isascii():
+        return address
+    name, addr = parseaddr(address)
+    return formataddr((name, addr), 'utf-8')
+
+
+def encode_body(body):
+    return base64.encodebytes(body.encode('utf-8')).decode('ascii')
+
+
+def compile_message(from_address, subject, body):
+    """
+    Pre-encode everything of an HTML mail that does not depend on the recipient
+
+    Subject and body are compiled templates; if they contain no placeholder
+    they are encoded here once as well, so a mailing without personalization
+    only adds the To header per recipient.
+    """
+    boundary = f"==============={secrets.randbelow(10 ** 19):019d}=="
+    subject = compile_template(subject)
+    body = compile_template(body)
+    return {
+        'head': (
+            f'Content-Type: multipart/alternative; boundary="{boundary}"\n'
+            'MIME-Version: 1.0\n'
+            f'From: {encode_address(from_address)}\n'
+        ),
+        'part': (
+            f'\n--{boundary}\n'
+            'Content-Type: text/html; charset="utf-8"\n'
+            'MIME-Version: 1.0\n'
+            'Content-Transfer-Encoding: base64\n\n'
+        ),
+        'tail': f'\n--{boundary}--\n',
+        'subject': subject,
+        'body': body,
+        'static_subject': encode_subject(subject[0]) if len(subject) == 1 else None,
+        'static_body': encode_body(body[0]) if len(body) == 1 else None,
+    }
+
+
+def render_message(compiled, email, variables=None):
+    """
+    Complete a compiled message for one recipient
+
+    Returns:
+        str: The message as it is sent to the server
+    """
+    subject = compiled['static_subject']
+    if subject is None:
+        subject = encode_subject(render_template(compiled['subject'], variables or {}))
+    body = compiled['static_body']
+    if body is None:
+        body = encode_body(render_template(compiled['body'], variables or {}))
+    return f"{compiled['head']}Subject: {subject}\nTo: {email}\n{compiled['part']}{body}{compiled['tail']}"
+
+
+def send_message(pool, from_address, email, text):
+    """
+    Send one message over a pooled connection
+
+    A connection the server dropped (e.g. after a number of messages) is
+    replaced and the message is sent once more over a fresh connection.
+
+    Returns:
+        dict: The failed_emails entry for this recipient, None if it was sent
+    """
+    import smtplib
+
+    for attempt in range(2):
+        try:
+            connection = pool.acquire()
+        except Exception as e:
+            return {
+                'email': email, 
+                'error': f'Failed to send email: {str(e)}',
+                'error_type': 'send_failed'
+            }
+        try:
+            connection[0].sendmail(from_address, email, text)
+            pool.release(connection)
+            return None
+        except smtplib.SMTPServerDisconnected as e:
+            pool.discard(connection)
+            if attempt == 0:
+                continue
+            return {
+                'email': email, 
+                'error': f'Failed to send email: {str(e)}',
+                'error_type': 'send_failed'
+            }
+        except smtplib.SMTPRecipientsRefused as e:
+            pool.release(connection)
+            return {
+                'email': email, 
+                'error': 'Recipient email address was refused by the server',
+                'error_type': 'recipient_refused'
+            }
+        except smtplib.SMTPDataError as e:
+            pool.release(connection)
+            return {
+                'email': email, 
+                'error': f'SMTP data error: {str(e)}',
+                'error_type': 'data_error'
+            }
+        except Exception as e:
+            # the state of the connection is unknown, do not reuse it
+            pool.discard(connection)
+            return {
+                'email': email, 
+                'error': f'Failed to send email: {str(e)}',
+                'error_type': 'send_failed'
+            }
+
+def check_mailing(recipient_emails, smtp_config):
+    """
+    Validate the SMTP configuration and the recipients of a mailing
+
+    Returns:
+        dict: The error response of send_email(), None if the mailing can be sent
+    """
+    # Validate SMTP configuration is provided
+    if smtp_config is None:
+        return {
+            'success': False, 
+            'message': 'SMTP configuration is required. Please provide server, port, username, and password.',
+            'error_type': 'missing_config'
+        }
+
+    # Validate required SMTP configuration fields
+    required_fields = ['server', 'port', 'username', 'password']
+    missing_fields = [field for field in required_fields if not smtp_config.get(field)]
+
+    if missing_fields:
+        return {
+            'success': False, 
+            'message': f'Missing required SMTP configuration fields: {", ".join(missing_fields)}',
+            'error_type': 'invalid_config',
+            'missing_fields': missing_fields
+        }
+
+    try:
+        smtp_limits(smtp_config)
+    except ValueError as e:
+        return {
+            'success': False, 
+            'message': f'Invalid SMTP configuration: {str(e)}',
+            'error_type': 'invalid_config'
+        }
+
+    from_address = smtp_config.get('from_address', smtp_config['username'])
+    if '\r' in from_address or '\n' in from_address:
+        return {
+            'success': False, 
+            'message': 'The from address must not contain line breaks',
+            'error_type': 'invalid_config'
+        }
+
+    # Validate email addresses
+    if not recipient_emails:
+        return {
+            'success': False, 
+            'message': 'No recipient email addresses provided',
+            'error_type': 'missing_recipients'
+        }
+
+    # Validate email format (basic validation)
+    invalid_emails = [
+        email for email in recipient_emails
+        if '@' not in email or '.' not in email.split('@')[-1] or '\r' in email or '\n' in email
+    ]
+    if invalid_emails:
+        return {
+            'success': False, 
+            'message': f'Invalid email format detected: {", ".join(invalid_emails)}',
+            'error_type': 'invalid_email_format',
+            'invalid_emails': invalid_emails
+        }
+    return None
+
+
+def open_connection(smtp_config):
+    """
+    Connect and log in to the SMTP server, the first connection of a mailing also checks the credentials
+
+    Returns:
+        tuple: (server, None) or (None, error response of send_email())
+    """
+    # smtplib is loaded with the first mailing, most workers never send one
+    import smtplib
+
+    try:
+        server = smtplib.SMTP(smtp_config['server'], int(smtp_config['port']))
+        server.starttls()
+    except Exception as e:
+        return None, {
+            'success': False, 
+            'message': f'Failed to connect to SMTP server {smtp_config["server"]}:{smtp_config["port"]}. Error: {str(e)}',
+            'error_type': 'connection_failed',
+            'smtp_server': smtp_config['server'],
+            'smtp_port': smtp_config['port']
+        }
+
+    try:
+        server.login(smtp_config['username'], smtp_config['password'])
+    except smtplib.SMTPAuthenticationError as e:
+        server.quit()
+        return None, {
+            'success': False, 
+            'message': f'SMTP authentication failed for {smtp_config["username"]}. Please check your username and password.',
+            'error_type': 'authentication_failed',
+            'username': smtp_config['username']
+        }
+    except Exception as e:
+        server.quit()
+        return None, {
+            'success': False, 
+            'message': f'Login failed: {str(e)}',
+            'error_type': 'login_failed'
+        }
+    return server, None
+
+
+def smtp_limits(smtp_config):
+    """
+    Pool size, messages per connection and rate of a mailing, capped by the server settings
+
+    A mailing may use fewer connections, reconnect more often and send
+    slower than the server allows, never the other way round.
+
+    Returns:
+        tuple: (pool_size, messages_per_connection, rate_limit)
+
+    Raises:
+        ValueError: If one of the values is not a number
+    """
+    def number(key, default):
+        try:
+            value = float(smtp_config.get(key, default))
+        except (TypeError, ValueError):
+            raise ValueError(f'{key} must be a number')
+        if not math.isfinite(value):
+            raise ValueError(f'{key} must be a finite number')
+        return value
+
+    pool_size = max(1, min(int(number('pool_size', SMTP_POOL_SIZE)), SMTP_POOL_SIZE))
+
+    messages = max(0, int(number('messages_per_connection', SMTP_MESSAGES_PER_CONNECTION)))
+    if SMTP_MESSAGES_PER_CONNECTION:
+        # 0 would mean no limit at all
+        messages = min(messages or SMTP_MESSAGES_PER_CONNECTION, SMTP_MESSAGES_PER_CONNECTION)
+
+    rate = max(0.0, number('rate_limit', SMTP_RATE_LIMIT))
+    if SMTP_RATE_LIMIT:
+        # 0 would turn the throttle off
+        rate = min(rate or SMTP_RATE_LIMIT, SMTP_RATE_LIMIT)
+    return pool_size, messages, rate
+
+
+def open_pool(smtp_config, server):
+    """
+    Connection pool and rate limiter of a mailing, starting with the already logged in server
+
+    Returns:
+        tuple: (pool, limiter)
+    """
+    try:
+        pool_size, messages, rate = smtp_limits(smtp_config)
+    except ValueError:
+        # the limits are checked by check_mailing() before logging in, never leave the connection open
+        try:
+            server.quit()
+        except Exception:
+            pass
+        raise
+    pool = SMTPPool(smtp_config, pool_size, messages)
+    pool.add(server)
+    return pool, RateLimiter(rate)
+
+
+def send_email(recipient_emails, subject, body, smtp_config=None, recipient_variables=None):
+    """
+    Send email using SMTP
+    
+    Args:
+        recipient_emails: List of email addresses or single email address
+        subject: Email subject, may contain {{variable_name}} placeholders
+        body: Email body (HTML supported), may contain {{variable_name}} placeholders
+        smtp_config: Dictionary with SMTP configuration (required)
+                    {'server': 'smtp.gmail.com', 'port': 587, 'username': 'user@gmail.com', 'password': 'password', 'from_address': 'sender@example.com'}
+                    Note: 'from_address' is optional. If not provided, 'username' will be used as the from address.
+                    Optional: 'pool_size' (capped by SMTP_POOL_SIZE), 'rate_limit' (messages per second,
+                    capped by SMTP_RATE_LIMIT), 'messages_per_connection' (reconnect after this many
+                    messages, capped by SMTP_MESSAGES_PER_CONNECTION)
+        recipient_variables: Optional list of variable dicts, one per recipient, to personalize
+                    subject and body; without it placeholders are sent as they are
+    
+    Returns:
+        dict: Success status and detailed message
+    """
+    try:
+        # Ensure recipient_emails is a list
+        if isinstance(recipient_emails, str):
+            recipient_emails = [recipient_emails]
+
+        error = check_mailing(recipient_emails, smtp_config)
+        if error is not None:
+            return error
+
+        from_address = smtp_config.get('from_address', smtp_config['username'])
+
+        # Connect to server, the first connection also checks the credentials
+        server, error = open_connection(smtp_config)
+        if error is not None:
+            return error
+
+        # Send emails over a pool of connections, spread over worker threads
+        pool, limiter = open_pool(smtp_config, server)
+
+        # subject and body are compiled once, per recipient only the variable parts are encoded
+        compiled = compile_message(from_address, subject, body)
+        if recipient_variables is None:
+            recipient_variables = [None] * len(recipient_emails)
+
+        def send(email, variables):
+            text = render_message(compiled, email, variables)
+            limiter.wait()
+            return send_message(pool, from_address, email, text)
+
+        try:
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                failed_emails = [
+                    error for error in executor.map(send, recipient_emails, recipient_variables) if error
+                ]
+        finally:
+            pool.close()
+        
+        if failed_emails:
+            return {
+                'success': len(failed_emails) < len(recipient_emails), 
+                'message': f'Sent {len(recipient_emails) - len(failed_emails)} of {len(recipient_emails)} emails successfully',
+                'failed_emails': failed_emails,
+                'sent_count': len(recipient_emails) - len(failed_emails),
+                'total_count': len(recipient_emails)
+            }
+        else:
+            return {
+                'success': True, 
+                'message': f'Successfully sent all {len(recipient_emails)} emails',
+                'sent_count': len(recipient_emails),
+                'total_count': len(recipient_emails)
+            }
+            
+    except Exception as e:
+        return {
+            'success': False, 
+            'message': f'Unexpected error occurred while sending emails: {str(e)}',
+            'error_type': 'unexpected_error'
+        }
@@ -0,0 +1,161 @@
+import math
+import threading
+
+# content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# latency buckets in seconds, from a cached answer to a solve at the time limit
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def collect(self):
+        with self.lock:
+            values = dict(self.values)
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Callback(Metric):
+    """
+    Gauge or counter whose values are read from elsewhere when the metrics are rendered
+
+    Args:
+        function: Returns {label values tuple: value}, or a single value if there are no labels
+    """
+
+    def __init__(self, name, documentation, kind, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.function = function
+
+    def collect(self):
+        values = self.function()
+        if not self.labelnames:
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][i] += 1
+                    break
+            entry["sum"] += value
+
+    def collect(self):
+        with self.lock:
+            values = {key: (list(entry["counts"]), entry["sum"]) for key, entry in self.values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics of this process in the Prometheus text format
+
+    With several worker processes every process keeps its own values,
+    Prometheus adds them up over the scraped instances.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def callback(self, name, documentation, kind, labelnames=(), function=None):
+        return self._add(Callback(name, documentation, kind, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        # registering a name again (e.g. by a second app in tests) replaces the old metric
+        self.metrics = [other for other in self.metrics if other.name != metric.name] + [metric]
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.header() + metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests", ("endpoint", "method", "status")
+)
+phase_latency = registry.histogram(
+    "request_phase_duration_seconds",
+    "Time spent per phase: app_check, auth, parse, load, build, solve, extract, store, smtp",
+    ("phase",),
+)
+solver_results = registry.counter(
+    "solver_results_total", "Finished assignment solves by backend and status", ("solver", "status")
+)
+mail_messages = registry.counter(
+    "mail_messages_total", "Mails of synchronous mailings by result", ("result",)
+)
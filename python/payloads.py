@@ -0,0 +1,152 @@
+from itertools import repeat
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Flask's provider with the json module is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack requests are answered with 415
+    msgpack = None
+
+from solver import DEFAULT_POINTS
+
+# content types of MessagePack bodies, responses use the first one
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    request.get_json() and jsonify() with orjson
+
+    The output matches Flask's provider (sorted keys, compact unless
+    pretty-printed), types orjson does not know go through Flask's default.
+    Calls with json.dumps() arguments like `indent` use the json module.
+    """
+
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.option | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype,
+        )
+
+
+def is_msgpack(mimetype):
+    return mimetype in MSGPACK_TYPES
+
+
+def unpack(body):
+    """
+    Decode a MessagePack body
+
+    Raises:
+        ValueError: If the body is no valid MessagePack
+    """
+    try:
+        # ids may be numbers, maps with other keys than strings are allowed
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    except (ValueError, msgpack.UnpackException) as e:
+        raise ValueError("Invalid MessagePack body") from e
+
+
+def pack(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def is_columnar(data):
+    return isinstance(data.get("students"), list)
+
+
+def from_columnar(data):
+    """
+    Convert the columnar body of /assign into preferences and projects
+
+    Parallel arrays instead of one object per student, for large elections
+    they are smaller and much faster to encode and decode:
+
+    {students: [studentId, ...], projects: [projectId, ...], max: [seats per project],
+     width: choices per student, choices: [project index, ...] row by row (students x width, -1 = no choice),
+     points: [number, ...] width entries for all students or students x width}
+
+    Args:
+        data: Body of the request
+
+    Returns:
+        tuple: (preferences, projects) like the body of /assign, without names and titles
+
+    Raises:
+        ValueError: If the arrays do not fit together
+    """
+    students = data["students"]
+    project_ids = data.get("projects")
+    capacity = data.get("max")
+    choices = data.get("choices")
+    if not isinstance(project_ids, list) or not isinstance(capacity, list) or len(project_ids) != len(capacity):
+        raise ValueError("projects and max must be lists of the same length")
+    if not isinstance(choices, list):
+        raise ValueError("choices must be a list of project indices")
+
+    width = data.get("width")
+    if width is None:
+        width = len(choices) // len(students) if students else 0
+    if not isinstance(width, int) or width < 0 or len(choices) != len(students) * width:
+        raise ValueError("choices must have width entries per student")
+    if not set(map(type, choices)) <= {int}:
+        raise ValueError("choices must be whole numbers")
+    if choices and (min(choices) < -1 or max(choices) >= len(project_ids)):
+        raise ValueError("choices must be indices into projects or -1")
+
+    points = data.get("points")
+    if points is None:
+        # like a student without points in the other format
+        points, shared = DEFAULT_POINTS, True
+    elif not isinstance(points, list) or len(points) not in (width, len(students) * width):
+        raise ValueError("points must have width entries, for all students or per student")
+    else:
+        shared = len(points) == width
+
+    project_ids = [str(project_id) for project_id in project_ids]
+    projects = {project_id: {"max": seats} for project_id, seats in zip(project_ids, capacity)}
+    preferences = {}
+    # rows of width entries without slicing, zip() over one iterator takes them in turn
+    rows = zip(*[iter(choices)] * width) if width else repeat((), len(students))
+    point_rows = repeat(points) if shared else map(list, zip(*[iter(points)] * width))
+    for student_id, row, row_points in zip(students, rows, point_rows):
+        if -1 in row:
+            # the points stay with their rank if a student left out a choice
+            preferences[str(student_id)] = {
+                "selected": [project_ids[j] for j in row if j >= 0],
+                "points": [value for j, value in zip(row, row_points) if j >= 0],
+            }
+        else:
+            preferences[str(student_id)] = {"selected": list(map(project_ids.__getitem__, row)), "points": row_points}
+    return preferences, projects
+
+
+def to_columnar(solution, data):
+    """
+    An assignment in the columnar form of the request
+
+    Returns:
+        dict: {assignment: [project index per student of the request, -1 = not assigned]}
+    """
+    index = {str(project_id): j for j, project_id in enumerate(data["projects"])}
+    return {"assignment": [index.get(str(solution.get(str(student_id))), -1) for student_id in data["students"]]}
@@ -0,0 +1,312 @@
+import math
+import os
+import time
+
+from solver import OVERBOOKING_PENALTY, build_instance
+
+# seconds for the lower bound and for improving the draft, at most half of it for the bound
+PREVIEW_TIME_LIMIT = float(os.environ.get("ASSIGN_PREVIEW_TIME_LIMIT", 0.1))
+
+# passes of the local search over all students, it also stops after a pass without improvement
+PREVIEW_MAX_PASSES = int(os.environ.get("ASSIGN_PREVIEW_MAX_PASSES", 10))
+
+# price updates of the lower bound
+PREVIEW_BOUND_ROUNDS = int(os.environ.get("ASSIGN_PREVIEW_BOUND_ROUNDS", 20))
+
+
+def greedy_assignment(instance, prices=None):
+    """
+    Give every student their cheapest choice that still has a free seat, rank by rank
+
+    All students get their first choice where there is room, then the rest
+    their second choice and so on. Students whose choices are all full go
+    to the choice that is cheapest including the overbooking penalty.
+
+    Args:
+        instance: Instance created by solver.build_instance()
+        prices: Optional price per seat of every project added to the points when
+                ranking the choices, e.g. from lagrangian_bound()
+
+    Returns:
+        tuple: (chosen pair per student, number of students per project)
+    """
+    capacity = instance["capacity"]
+    pair_project = instance["pair_project"]
+    pair_cost = instance["pair_cost"]
+    load = [0] * len(capacity)
+
+    if prices is None:
+        rank_cost = pair_cost
+    else:
+        rank_cost = [cost + prices[j] for cost, j in zip(pair_cost, pair_project)]
+    ranked = [sorted(pairs, key=rank_cost.__getitem__) for pairs in instance["student_pairs"]]
+    chosen = [None] * len(ranked)
+    waiting = list(range(len(ranked)))
+    for rank in range(max(map(len, ranked), default=0)):
+        left = []
+        for i in waiting:
+            if rank < len(ranked[i]):
+                j = pair_project[ranked[i][rank]]
+                if load[j] < capacity[j]:
+                    chosen[i] = ranked[i][rank]
+                    load[j] += 1
+                    continue
+            left.append(i)
+        waiting = left
+
+    for i in waiting:
+        k = min(
+            ranked[i],
+            key=lambda k: pair_cost[k] + (OVERBOOKING_PENALTY if load[pair_project[k]] >= capacity[pair_project[k]] else 0),
+        )
+        chosen[i] = k
+        load[pair_project[k]] += 1
+    return chosen, load
+
+
+def improve_assignment(instance, chosen, load, deadline, max_passes=PREVIEW_MAX_PASSES):
+    """
+    Move students to other choices as long as that lowers the objective
+
+    A move either takes one student to another of their choices, or lets a
+    student take a seat in a full project while a student of that project
+    moves on to one of their own choices (a swap if it is the seat left free).
+    `chosen` and `load` are updated in place.
+
+    Args:
+        instance: Instance created by solver.build_instance()
+        chosen: Chosen pair per student, e.g. from greedy_assignment()
+        load: Number of students per project
+        deadline: time.perf_counter() value at which the search stops
+        max_passes: Maximum number of passes over all students
+
+    Returns:
+        int: Number of moves made
+    """
+    capacity = instance["capacity"]
+    pair_project = instance["pair_project"]
+    pair_cost = instance["pair_cost"]
+    student_pairs = instance["student_pairs"]
+
+    members = [set() for _ in capacity]
+    for i, k in enumerate(chosen):
+        members[pair_project[k]].add(i)
+
+    # cheapest change of points of a student of the project moving elsewhere, None = unknown;
+    # penalties only add to it, so chains through a project with a high floor are skipped
+    exit_floor = [None] * len(capacity)
+
+    def floor(q):
+        if exit_floor[q] is None:
+            exit_floor[q] = min(
+                (
+                    pair_cost[r_k] - pair_cost[chosen[b]]
+                    for b in members[q]
+                    for r_k in student_pairs[b]
+                    if pair_project[r_k] != q
+                ),
+                default=None,
+            )
+            if exit_floor[q] is None:
+                exit_floor[q] = float("inf")
+        return exit_floor[q]
+
+    def leave(j):
+        # change of the penalty if one student leaves project j
+        return -OVERBOOKING_PENALTY if load[j] > capacity[j] else 0
+
+    def join(j):
+        # change of the penalty if one student joins project j
+        return OVERBOOKING_PENALTY if load[j] >= capacity[j] else 0
+
+    def move(i, k):
+        old = pair_project[chosen[i]]
+        new = pair_project[k]
+        members[old].remove(i)
+        members[new].add(i)
+        exit_floor[old] = exit_floor[new] = None
+        load[old] -= 1
+        load[new] += 1
+        chosen[i] = k
+
+    moves = 0
+    for _ in range(max_passes):
+        improved = False
+        for a in range(len(chosen)):
+            if time.perf_counter() > deadline:
+                return moves
+            current = chosen[a]
+            p = pair_project[current]
+            best = None
+            for k in student_pairs[a]:
+                q = pair_project[k]
+                if q == p:
+                    continue
+                # only a seat that is cheaper for a, or a way out of an overbooked project, can pay off
+                gain = pair_cost[k] - pair_cost[current] + leave(p)
+                if gain >= 0:
+                    continue
+                delta = gain + join(q)
+                if delta < 0 and (best is None or delta < best[0]):
+                    best = (delta, k, None, None)
+                    continue
+                # q is full: a student b of q makes room by moving to one of their other choices
+                if gain + floor(q) >= 0:
+                    continue
+                for b in members[q]:
+                    b_current = chosen[b]
+                    for r_k in student_pairs[b]:
+                        r = pair_project[r_k]
+                        if r == q:
+                            continue
+                        delta = gain + pair_cost[r_k] - pair_cost[b_current]
+                        if r != p:
+                            delta += join(r)
+                        else:
+                            delta -= leave(p)
+                        if delta < 0 and (best is None or delta < best[0]):
+                            best = (delta, k, b, r_k)
+            if best is None:
+                continue
+            _, k, b, r_k = best
+            if b is not None:
+                move(b, r_k)
+            move(a, k)
+            moves += 1
+            improved = True
+        if not improved:
+            break
+    return moves
+
+
+def lagrangian_bound(instance, upper, deadline, max_rounds=PREVIEW_BOUND_ROUNDS):
+    """
+    Lower bound of the objective from pricing the seats of the projects
+
+    The capacities move into the objective as a price per seat between 0
+    and the overbooking penalty: every student pays their cheapest choice
+    including its price, minus the price of all seats. Any prices give a
+    bound, prices of 0 give the sum of the cheapest choices. Subgradient
+    steps raise the prices of over-demanded projects towards the LP
+    relaxation, and the prices tell the greedy where seats are scarce.
+
+    Args:
+        instance: Instance created by solver.build_instance()
+        upper: Objective of a known assignment, used for the step size
+        deadline: time.perf_counter() value after which no further round starts
+        max_rounds: Maximum number of price updates
+
+    Returns:
+        tuple: (best bound, prices per project that gave it)
+    """
+    capacity = instance["capacity"]
+    pair_project = instance["pair_project"]
+    pair_cost = instance["pair_cost"]
+    prices = [0.0] * len(capacity)
+    best, best_prices = float("-inf"), prices
+    scale = 1.0
+    stalled = 0
+
+    for _ in range(max_rounds):
+        value = -sum(price * seats for price, seats in zip(prices, capacity))
+        demand = [0] * len(capacity)
+        for pairs in instance["student_pairs"]:
+            cheapest = None
+            for k in pairs:
+                cost = pair_cost[k] + prices[pair_project[k]]
+                if cheapest is None or cost < cheapest:
+                    cheapest, j = cost, pair_project[k]
+            value += cheapest
+            demand[j] += 1
+
+        if value > best + 1e-9:
+            best, best_prices, stalled = value, prices, 0
+        else:
+            # halve the steps when the bound stops rising
+            stalled += 1
+            if stalled >= 3:
+                scale, stalled = scale / 2, 0
+        if best >= upper or time.perf_counter() > deadline:
+            break
+
+        # subgradient, without components that would push a price out of [0, penalty]
+        step = [
+            0 if (g < 0 and price <= 0) or (g > 0 and price >= OVERBOOKING_PENALTY) else g
+            for g, price in ((d - c, price) for d, c, price in zip(demand, capacity, prices))
+        ]
+        norm = sum(g * g for g in step)
+        if norm == 0:
+            break
+        t = scale * (upper - value) / norm
+        prices = [min(OVERBOOKING_PENALTY, max(0.0, price + t * g)) for price, g in zip(prices, step)]
+
+    return min(best, upper), best_prices
+
+
+def objective_value(instance, chosen, load):
+    capacity = instance["capacity"]
+    return sum(instance["pair_cost"][k] for k in chosen) + OVERBOOKING_PENALTY * sum(
+        max(0, load[j] - capacity[j]) for j in range(len(capacity))
+    )
+
+
+def preview_assignment(preferences, projects, time_limit=PREVIEW_TIME_LIMIT):
+    """
+    Draft assignment in milliseconds: greedy by preference rank, then local search
+
+    Uses the cost model of solver.solve_assignment() (points plus the
+    overbooking penalty), so the objective is comparable to an exact solve.
+    The greedy runs twice, on the points and on the points plus the seat
+    prices of the lower bound, and the better draft is improved by local
+    search. It is only known to be optimal if it reaches the lower bound.
+
+    Args:
+        preferences: {studentId: {selected: [projectId, ...], points: [number, ...]}}
+        projects: {projectId: {title: string, max: number}}
+        time_limit: Seconds for the lower bound and the local search
+
+    Returns:
+        dict: {solution: {studentId: projectId}, status: "optimal" or "feasible",
+               objective: number, lower_bound: number, gap: (objective - lower_bound) / objective,
+               moves: number of local search moves, time: seconds, phases: {build, solve} in seconds,
+               state: state for a later start}
+
+    Raises:
+        ValueError: If a student has no valid choice
+    """
+    started = time.perf_counter()
+    instance = build_instance(preferences, projects)
+    if not all(instance["student_pairs"]):
+        raise ValueError("No feasible assignment: some students have no valid choice")
+    built = time.perf_counter()
+
+    chosen, load = greedy_assignment(instance)
+    objective = objective_value(instance, chosen, load)
+    bound, prices = lagrangian_bound(instance, objective, built + time_limit / 2)
+    if objective > bound:
+        priced, priced_load = greedy_assignment(instance, prices)
+        priced_objective = objective_value(instance, priced, priced_load)
+        if priced_objective < objective:
+            chosen, load, objective = priced, priced_load, priced_objective
+    moves = improve_assignment(instance, chosen, load, built + time_limit)
+    objective = objective_value(instance, chosen, load)
+    # with whole points the objective is whole as well
+    if all(float(cost).is_integer() for cost in instance["pair_cost"]):
+        bound = math.ceil(bound - 1e-9)
+
+    solution = {
+        instance["student_keys"][i]: instance["project_keys"][instance["pair_project"][k]]
+        for i, k in enumerate(chosen)
+    }
+    finished = time.perf_counter()
+    return {
+        "solution": solution,
+        "status": "optimal" if objective <= bound else "feasible",
+        "objective": objective,
+        "lower_bound": bound,
+        "gap": (objective - bound) / objective if objective else 0.0,
+        "moves": moves,
+        "time": finished - started,
+        "phases": {"build": built - started, "solve": finished - built},
+        "state": {"assignment": solution},
+    }
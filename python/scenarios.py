@@ -0,0 +1,267 @@
+import math
+import os
+import time
+
+from decompose import component_options
+from flow import flow_assignment
+from solver import (
+    OVERBOOKING_PENALTY,
+    build_instance,
+    build_problem,
+    get_mip_solver,
+    set_warm_start,
+    solution_status,
+)
+
+# maximum number of scenarios in one /assign/scenarios request, the base scenario not counted
+MAX_SCENARIOS = int(os.environ.get("ASSIGN_MAX_SCENARIOS", 20))
+
+
+def parse_scenarios(scenarios, projects):
+    """
+    Validate the scenarios of a request
+
+    Args:
+        scenarios: [{id: string, capacities: {projectId: max}, extra_seats: {projectId: seats},
+                     penalty: number}], every key but `id` optional
+        projects: {projectId: {title: string, max: number}} of the base scenario
+
+    Returns:
+        list: [{id, capacities: {projectId: max}, penalty}], the base scenario first
+
+    Raises:
+        ValueError: If a scenario is invalid or there are too many
+    """
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError("No scenarios provided")
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f"At most {MAX_SCENARIOS} scenarios per request are allowed")
+
+    variants = [{"id": "base", "capacities": {}, "penalty": OVERBOOKING_PENALTY}]
+    for index, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            raise ValueError(f"Scenario {index} must be an object")
+        capacities = {}
+        # absolute capacities first, extra seats are added on top of the result
+        for key, relative in (("capacities", False), ("extra_seats", True)):
+            changes = scenario.get(key) or {}
+            if not isinstance(changes, dict):
+                raise ValueError(f"{key} of scenario {index} must map project ids to numbers")
+            for project_id, value in changes.items():
+                project_id = str(project_id)
+                if project_id not in projects:
+                    raise ValueError(f"Unknown project '{project_id}' in scenario {index}")
+                base = capacities.get(project_id, int(projects[project_id]["max"])) if relative else 0
+                capacities[project_id] = base + int(value)
+                if capacities[project_id] < 0:
+                    raise ValueError(f"Negative capacity of project '{project_id}' in scenario {index}")
+        penalty = float(scenario.get("penalty", OVERBOOKING_PENALTY))
+        if penalty < 0:
+            raise ValueError(f"penalty of scenario {index} must not be negative")
+        variants.append({"id": str(scenario.get("id", index)), "capacities": capacities, "penalty": penalty})
+    return variants
+
+
+def variant_instance(instance, variant):
+    """
+    The instance with the capacities of a scenario
+    """
+    capacity = [
+        variant["capacities"].get(project_id, seats)
+        for project_id, seats in zip(instance["project_keys"], instance["capacity"])
+    ]
+    return {**instance, "capacity": capacity}
+
+
+def solve_variants(instance, variants, solver, options, deadline=None):
+    """
+    Solve scenarios of one election one after another, reusing the model
+
+    For the MIP backends the PuLP model is built once. Every scenario only
+    changes the right-hand sides of the project constraints and the
+    objective coefficients of the overbooking variables. HiGHS keeps its
+    model between the scenarios and gets only these changes, CBC starts
+    from the assignment of the previous scenario. The flow backend
+    re-optimizes the flow and potentials of the previous scenario. The
+    scenarios share the time limit: each gets its share of the time left
+    until the deadline.
+
+    Args:
+        instance: Instance created by solver.build_instance() with the base capacities
+        variants: Scenarios created by parse_scenarios()
+        solver: "cbc", "highs" or "flow"
+        options: Solver options created by solver.parse_solver_options()
+        deadline: Optional time.time() by which all scenarios have to be solved,
+                  the time limit of the options from now if not given
+
+    Returns:
+        dict: {build: seconds, solver: backend that actually ran,
+               rows: [{id, status, objective, gap, time, chosen: pair per student} or {id, error}]}
+    """
+    started = time.perf_counter()
+    if deadline is None:
+        deadline = time.time() + options["time_limit"]
+    rows = []
+    if solver == "flow":
+        build = 0.0
+        state = None
+        for index, variant in enumerate(variants):
+            variant_started = time.perf_counter()
+            time_limit = component_options(options, deadline, len(variants) - index)["time_limit"]
+            try:
+                chosen, objective, state = flow_assignment(
+                    variant_instance(instance, variant), variant["penalty"], state, time.time() + time_limit
+                )
+            except Exception as e:
+                rows.append({"id": variant["id"], "error": str(e)})
+                continue
+            rows.append({
+                "id": variant["id"],
+                "status": "optimal",
+                "objective": objective,
+                "gap": 0.0,
+                "time": time.perf_counter() - variant_started,
+                "chosen": chosen,
+            })
+        return {"build": build, "solver": solver, "rows": rows}
+
+    import pulp
+
+    problem, x, o = build_problem(instance)
+    build = time.perf_counter() - started
+    previous = None
+    mip_solver = model = None
+    # HiGHS gets the rows in the order of problem.constraints, PuLP 2.x does not number them
+    rows_of = {name: row for row, name in enumerate(problem.constraints)}
+    for index, variant in enumerate(variants):
+        variant_started = time.perf_counter()
+        current = variant_instance(instance, variant)
+        variant_options = component_options(options, deadline, len(variants) - index)
+        try:
+            # sum(x) - o_j <= capacity is stored as sum(x) - o_j - capacity <= 0
+            for j, seats in enumerate(current["capacity"]):
+                constraint = problem.constraints.get(f"project_{j}")
+                if constraint is not None:
+                    constraint.constant = -seats
+                    if model is not None:
+                        model.changeRowBounds(rows_of[f"project_{j}"], -math.inf, seats)
+            for o_j in o:
+                problem.objective[o_j] = variant["penalty"]
+                if model is not None:
+                    model.changeColCost(o_j.index, variant["penalty"])
+            if model is not None:
+                # HiGHS still holds the model of the previous scenario with the changes above,
+                # PuLP would pass the whole model again
+                model.setOptionValue("time_limit", variant_options["time_limit"])
+                model.run()
+                problem.assignStatus(*mip_solver.findSolutionValues(problem))
+            else:
+                solver_options = variant_options
+                if previous is not None:
+                    set_warm_start(current, x, o, previous)
+                    solver_options = {**variant_options, "warm_start": previous}
+                mip_solver, solver = get_mip_solver(solver, solver_options)
+                problem.solve(mip_solver)
+                if solver == "highs":
+                    model = getattr(problem, "solverModel", None)
+            status, gap = solution_status(problem, solver)
+        except Exception as e:
+            rows.append({"id": variant["id"], "error": str(e)})
+            continue
+        chosen = [None] * len(instance["student_keys"])
+        for k, variable in enumerate(x):
+            if variable.varValue is not None and round(variable.varValue) == 1:
+                chosen[instance["pair_student"][k]] = k
+        previous = {
+            instance["student_keys"][i]: instance["project_keys"][instance["pair_project"][k]]
+            for i, k in enumerate(chosen)
+            if k is not None
+        }
+        rows.append({
+            "id": variant["id"],
+            "status": status,
+            "objective": pulp.value(problem.objective),
+            "gap": gap,
+            "time": time.perf_counter() - variant_started,
+            "chosen": chosen,
+        })
+    return {"build": build, "solver": solver, "rows": rows}
+
+
+def scenario_summary(instance, variant, row, base_chosen):
+    """
+    Comparison row of a solved scenario
+
+    Returns:
+        dict: {id, status, objective, gap, choices: share of students per choice rank (1st, 2nd, ...),
+               overbooked: seats over capacity, moved: students assigned differently than in the base
+               scenario, time: seconds}
+    """
+    if "error" in row:
+        return {"id": row["id"], "error": row["error"]}
+    chosen = row["chosen"]
+    ranks = [0] * max(map(len, instance["student_pairs"]), default=0)
+    load = [0] * len(instance["project_keys"])
+    for i, k in enumerate(chosen):
+        if k is None:
+            continue
+        ranks[instance["student_pairs"][i].index(k)] += 1
+        load[instance["pair_project"][k]] += 1
+    capacity = variant_instance(instance, variant)["capacity"]
+    students = len(chosen) or 1
+    return {
+        "id": row["id"],
+        "status": row["status"],
+        "objective": row["objective"],
+        "gap": row["gap"],
+        "choices": [round(count / students, 4) for count in ranks],
+        "overbooked": sum(max(0, seats - limit) for seats, limit in zip(load, capacity)),
+        "moved": None if base_chosen is None else sum(1 for k, b in zip(chosen, base_chosen) if k != b),
+        "time": row["time"],
+    }
+
+
+def solve_scenarios(preferences, projects, variants, solver, options, submit, parallel=1):
+    """
+    Solve the scenarios of an election, in parallel chunks that each reuse one model
+
+    Args:
+        preferences: {studentId: {selected: [projectId, ...], points: [number, ...]}}
+        projects: {projectId: {title: string, max: number}}
+        variants: Scenarios created by parse_scenarios(), the base scenario first
+        solver: "cbc", "highs" or "flow"
+        options: Solver options created by solver.parse_solver_options()
+        submit: Function like submit_solve(function, *args) returning a future
+        parallel: Number of chunks solved at the same time
+
+    Returns:
+        dict: {solver: backend that actually ran, scenarios: [row per scenario, see scenario_summary()],
+               phases: {build, solve} in seconds}
+    """
+    started = time.perf_counter()
+    # one time limit for the whole request, the chunks share it
+    deadline = time.time() + options["time_limit"]
+    instance = build_instance(preferences, projects)
+    built = time.perf_counter() - started
+
+    # neighbouring scenarios usually differ little, so every chunk is a contiguous run of them
+    size = math.ceil(len(variants) / max(1, min(parallel, len(variants))))
+    futures = [
+        submit(solve_variants, instance, variants[start:start + size], solver, options, deadline)
+        for start in range(0, len(variants), size)
+    ]
+    rows = []
+    for future in futures:
+        result = future.result()
+        built += result["build"]
+        solver = result["solver"]
+        rows += result["rows"]
+
+    base_chosen = rows[0].get("chosen")
+    return {
+        "solver": solver,
+        "scenarios": [
+            scenario_summary(instance, variant, row, base_chosen) for variant, row in zip(variants, rows)
+        ],
+        "phases": {"build": built, "solve": sum(row.get("time", 0.0) for row in rows)},
+    }
@@ -0,0 +1,407 @@
+import logging
+import math
+import os
+import time
+
+from flow import flow_assignment
+
+logger = logging.getLogger(__name__)
+
+# default points for the 1st, 2nd and 3rd choice if a student has no custom points
+DEFAULT_POINTS = [1, 2, 4]
+
+# cost of every seat a project is overbooked by
+OVERBOOKING_PENALTY = 10
+
+# PuLP classes of the MIP backends; "cbc" writes a model file and spawns the CBC binary,
+# "highs" passes the model in memory to HiGHS through highspy (no temp files, no subprocess)
+MIP_SOLVERS = {
+    "cbc": "PULP_CBC_CMD",
+    "highs": "HiGHS",
+}
+
+# available solver backends, "cbc" is the reference
+SOLVERS = ("cbc", "highs", "flow")
+
+# backend used when a request does not ask for one
+DEFAULT_SOLVER = os.environ.get("ASSIGN_SOLVER", "cbc")
+
+# server-side caps for the solver_options of a request
+MAX_TIME_LIMIT = float(os.environ.get("ASSIGN_MAX_TIME_LIMIT", 60))
+MAX_THREADS = int(os.environ.get("ASSIGN_MAX_THREADS", os.cpu_count() or 1))
+
+
+def build_instance(preferences, projects):
+    """
+    Transform the request payload into flat index arrays for the solver
+
+    Only the (student, project) pairs a student actually selected are kept,
+    so everything built from the instance grows with the number of choices
+    and not with students x projects.
+
+    Args:
+        preferences: {studentId: {selected: [projectId, ...], points: [number, ...]}}
+        projects: {projectId: {title: string, max: number}}
+
+    Returns:
+        dict: Instance with the following keys
+            student_keys: list of student ids, index = student number
+            project_keys: list of project ids, index = project number
+            capacity: list of maximum participants per project
+            pair_student, pair_project, pair_cost: parallel lists, one entry per choice
+            student_pairs: list of pair indices per student
+            project_pairs: list of pair indices per project
+    """
+    student_keys = list(preferences.keys())
+    project_keys = list(projects.keys())
+
+    # transform the ids of the projects into consistent integers
+    project_ids = {project_id: j for j, project_id in enumerate(project_keys)}
+
+    capacity = [int(project["max"]) for project in projects.values()]
+
+    pair_student = []
+    pair_project = []
+    pair_cost = []
+    student_pairs = []
+    project_pairs = [[] for _ in project_keys]
+
+    for i, student in enumerate(preferences.values()):
+        points = student.get("points", DEFAULT_POINTS)
+        pairs = []
+        seen = set()
+        # every choice with points becomes one variable; a project selected twice keeps its best rank
+        for project_id, cost in zip(student["selected"], points):
+            j = project_ids[str(project_id)]
+            if j in seen:
+                continue
+            seen.add(j)
+            pairs.append(len(pair_student))
+            project_pairs[j].append(len(pair_student))
+            pair_student.append(i)
+            pair_project.append(j)
+            pair_cost.append(cost)
+        student_pairs.append(pairs)
+
+    return {
+        "student_keys": student_keys,
+        "project_keys": project_keys,
+        "capacity": capacity,
+        "pair_student": pair_student,
+        "pair_project": pair_project,
+        "pair_cost": pair_cost,
+        "student_pairs": student_pairs,
+        "project_pairs": project_pairs,
+    }
+
+
+def build_problem(instance):
+    """
+    Build the sparse PuLP model for an instance
+
+    Args:
+        instance: Instance created by build_instance()
+
+    Returns:
+        tuple: (problem, x, o) with x being the list of pair variables and o the overbooking variables
+    """
+    # PuLP is only loaded once a MIP is solved, the flow backend and the web app start without it
+    import pulp
+
+    problem = pulp.LpProblem("CourseAssignment", pulp.LpMinimize)
+
+    # Decision variables: x[k] is 1 if the student of pair k is assigned to the project of pair k
+    x = [
+        pulp.LpVariable(f"x_{i}_{j}", cat="Binary")
+        for i, j in zip(instance["pair_student"], instance["pair_project"])
+    ]
+
+    # Overbooking variables: o[j] is 0 or more if project j is overbooked
+    o = [
+        pulp.LpVariable(f"o_{j}", lowBound=0, cat="Integer")
+        for j in range(len(instance["project_keys"]))
+    ]
+
+    # Objective function: Minimize preference scores and overbooking penalties
+    problem += pulp.LpAffineExpression(
+        [(x[k], cost) for k, cost in enumerate(instance["pair_cost"])]
+        + [(o_j, OVERBOOKING_PENALTY) for o_j in o]
+    )
+
+    # Constraint: Each participant is assigned to exactly one of their choices
+    for i, pairs in enumerate(instance["student_pairs"]):
+        problem += (
+            pulp.LpAffineExpression([(x[k], 1) for k in pairs]) == 1,
+            f"student_{i}",
+        )
+
+    # Constraint: Maximum number of participants per project (with overbooking)
+    for j, pairs in enumerate(instance["project_pairs"]):
+        if not pairs:
+            continue
+        problem += (
+            pulp.LpAffineExpression([(x[k], 1) for k in pairs] + [(o[j], -1)])
+            <= instance["capacity"][j],
+            f"project_{j}",
+        )
+
+    return problem, x, o
+
+
+def extract_solution(instance, x):
+    """
+    Read the assignment from solved pair variables
+
+    Returns:
+        dict: {studentId: projectId}
+    """
+    solution = {}
+    for k, variable in enumerate(x):
+        if variable.varValue is not None and round(variable.varValue) == 1:
+            solution[instance["student_keys"][instance["pair_student"][k]]] = (
+                instance["project_keys"][instance["pair_project"][k]]
+            )
+    return solution
+
+
+def _number(value, name):
+    # NaN and infinity would pass every comparison with a cap
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    return number
+
+
+def parse_solver_options(options):
+    """
+    Validate the solver_options of a request and apply the server-side caps
+
+    Args:
+        options: {time_limit: seconds, gap: relative gap, threads: number,
+                  warm_start: {studentId: projectId}} (all optional);
+                 warm_start is only used by CBC, the other backends ignore it
+
+    Returns:
+        dict: Normalized options, the time limit always being set
+
+    Raises:
+        ValueError: If an option has an invalid value
+    """
+    options = options or {}
+    if not isinstance(options, dict):
+        raise ValueError("solver_options must be an object")
+
+    unknown = set(options) - {"time_limit", "gap", "threads", "warm_start"}
+    if unknown:
+        raise ValueError(f"Unknown solver options: {', '.join(sorted(unknown))}")
+
+    time_limit = _number(options.get("time_limit", MAX_TIME_LIMIT), "time_limit")
+    if time_limit <= 0:
+        raise ValueError("time_limit must be positive")
+
+    gap = options.get("gap")
+    if gap is not None:
+        gap = _number(gap, "gap")
+        if gap < 0:
+            raise ValueError("gap must not be negative")
+
+    threads = int(options.get("threads") or 1)
+    if threads < 1:
+        raise ValueError("threads must be at least 1")
+
+    warm_start = options.get("warm_start")
+    if warm_start is not None and not isinstance(warm_start, dict):
+        raise ValueError("warm_start must map student ids to project ids")
+
+    return {
+        "time_limit": min(time_limit, MAX_TIME_LIMIT),
+        "gap": gap,
+        "threads": min(threads, MAX_THREADS),
+        "warm_start": warm_start,
+    }
+
+
+def get_mip_solver(name, options):
+    """
+    Create the PuLP solver for a MIP backend
+
+    Falls back to the CBC command line if the requested backend is not
+    available (e.g. highspy is not installed). Only CBC reads a warm start,
+    the other backends ignore it.
+
+    Returns:
+        tuple: (PuLP solver, name of the backend that actually runs)
+    """
+    import pulp
+
+    mip_solver = getattr(pulp, MIP_SOLVERS[name])(
+        msg=False,
+        timeLimit=options["time_limit"],
+        gapRel=options["gap"],
+        threads=options["threads"],
+    )
+    if not mip_solver.available():
+        logger.warning("Solver '%s' is not available, falling back to CBC", name)
+        name = "cbc"
+        mip_solver = pulp.PULP_CBC_CMD(
+            msg=False,
+            timeLimit=options["time_limit"],
+            gapRel=options["gap"],
+            threads=options["threads"],
+        )
+    # only CBC reads the initial values of the variables as start solution
+    if name == "cbc" and options["warm_start"]:
+        mip_solver.optionsDict["warmStart"] = True
+    elif options["warm_start"]:
+        logger.info("Solver '%s' does not read a warm start, it is ignored", name)
+    return mip_solver, name
+
+
+def set_warm_start(instance, x, o, warm_start):
+    """
+    Use a previous assignment {studentId: projectId} as initial values of the model
+
+    Students that are new or whose previous project is no longer one of
+    their choices start at their first choice, so the start stays complete.
+    """
+    project_ids = {project_id: j for j, project_id in enumerate(instance["project_keys"])}
+    load = [0] * len(o)
+    for i, student_id in enumerate(instance["student_keys"]):
+        pairs = instance["student_pairs"][i]
+        if not pairs:
+            continue
+        previous = project_ids.get(str(warm_start.get(student_id)))
+        initial = next((k for k in pairs if instance["pair_project"][k] == previous), pairs[0])
+        for k in pairs:
+            x[k].setInitialValue(1 if k == initial else 0)
+        load[instance["pair_project"][initial]] += 1
+    for j, o_j in enumerate(o):
+        o_j.setInitialValue(max(0, load[j] - instance["capacity"][j]))
+
+
+def solution_status(problem, solver):
+    """
+    Status of a solved PuLP model
+
+    Returns:
+        tuple: ("optimal" or "feasible", relative gap or None if unknown)
+
+    Raises:
+        ValueError: If there is no feasible assignment
+        TimeoutError: If the time limit ended the solve before an assignment was found
+        RuntimeError: If the solver stopped without finding an assignment for another reason
+    """
+    import pulp
+
+    if problem.status == pulp.LpStatusInfeasible:
+        raise ValueError("No feasible assignment: some students have no valid choice")
+    if problem.status == pulp.LpStatusNotSolved:
+        raise TimeoutError("No assignment found within the time limit")
+    if problem.sol_status == pulp.LpSolutionOptimal:
+        return "optimal", 0.0
+    if problem.sol_status == pulp.LpSolutionIntegerFeasible:
+        # stopped by the time limit or gap, HiGHS reports the remaining gap
+        gap = None
+        if solver == "highs" and getattr(problem, "solverModel", None) is not None:
+            gap = problem.solverModel.getInfo().mip_gap
+        return "feasible", gap
+    raise RuntimeError(f"Solver stopped without an assignment ({pulp.LpStatus[problem.status]})")
+
+
+def solve_assignment(
+    preferences, projects, solver=DEFAULT_SOLVER, options=None, progress=None, start=None
+):
+    """
+    Assign every student to exactly one of their chosen projects
+
+    Args:
+        preferences: {studentId: {selected: [projectId, ...], points: [number, ...]}}
+        projects: {projectId: {title: string, max: number}}
+        solver: "cbc" to solve the MIP with the CBC binary, "highs" to solve it in-process
+                with HiGHS, "flow" to solve it in-process as min-cost flow
+        options: Solver options created by parse_solver_options()
+        progress: Optional callback, called with "build", "solve" and "extract" when a phase starts
+        start: Optional state of a previous solve of the same election to re-optimize from
+
+    Returns:
+        dict: {solution: {studentId: projectId}, solver: backend that actually ran
+               (highs falls back to cbc without highspy), status: "optimal" or "feasible",
+               objective: number, gap: relative gap or None if unknown, time: seconds,
+               phases: {build, solve, extract} in seconds, state: state for a later start}
+
+    Raises:
+        ValueError: If the solver is unknown or there is no feasible assignment
+        RuntimeError: If the solver stopped without finding an assignment
+        TimeoutError: If no assignment was found within the time limit
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}', expected one of: {', '.join(SOLVERS)}")
+    if options is None:
+        options = parse_solver_options(None)
+
+    if progress is None:
+        progress = lambda phase: None
+
+    started = time.perf_counter()
+    phases = {}
+    current = ["build", started]
+
+    def enter(phase):
+        # adds the time since the last call to the phase that ends, None ends the last phase
+        now = time.perf_counter()
+        phases[current[0]] = phases.get(current[0], 0.0) + now - current[1]
+        current[:] = [phase, now]
+        if phase is not None:
+            progress(phase)
+
+    progress("build")
+    instance = build_instance(preferences, projects)
+
+    if solver == "flow":
+        # min-cost flow always ends with a proven optimal solution
+        enter("solve")
+        chosen, objective, state = flow_assignment(
+            instance, OVERBOOKING_PENALTY, start, time.time() + options["time_limit"]
+        )
+        enter(None)
+        return {
+            "solution": state["assignment"],
+            "solver": solver,
+            "status": "optimal",
+            "objective": objective,
+            "gap": 0.0,
+            "time": time.perf_counter() - started,
+            "phases": phases,
+            "state": state,
+        }
+
+    import pulp
+
+    problem, x, o = build_problem(instance)
+    # re-optimize from the previous assignment unless the request brings its own start
+    warm_start = options["warm_start"] or (start or {}).get("assignment")
+    if warm_start:
+        set_warm_start(instance, x, o, warm_start)
+        options = {**options, "warm_start": warm_start}
+    enter("solve")
+    mip_solver, solver = get_mip_solver(solver, options)
+    problem.solve(mip_solver)
+    enter("extract")
+
+    status, gap = solution_status(problem, solver)
+    solution = extract_solution(instance, x)
+    objective = pulp.value(problem.objective)
+    enter(None)
+    return {
+        "solution": solution,
+        "solver": solver,
+        "status": status,
+        "objective": objective,
+        "gap": gap,
+        "time": time.perf_counter() - started,
+        "phases": phases,
+        "state": {"assignment": solution},
+    }
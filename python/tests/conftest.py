@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import types
+
+import pytest
+
+# the modules of the service are imported by name, like gunicorn and the benchmark do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# token and uid of the signed in admin in the stand-in backend
+TOKEN = "admin-token"
+UID = "admin"
+
+
+class StandInAuth:
+    """
+    The functions of firebase_admin.auth the app uses, backed by a list of users
+    """
+
+    EmailIdentifier = staticmethod(lambda email: email)
+    ImportUserRecord = staticmethod(types.SimpleNamespace)
+
+    class UserImportHash:
+        standard_scrypt = staticmethod(lambda **params: ("standard_scrypt", params))
+
+    def __init__(self):
+        self.users = []
+        self.verified = 0
+        # emails whose lookup raises, like a failing get_users call
+        self.failing_emails = set()
+        self.imported = []
+
+    def verify_id_token(self, token, check_revoked=False):
+        self.verified += 1
+        if token != TOKEN:
+            raise ValueError("invalid token")
+        return {"uid": UID, "exp": time.time() + 3600}
+
+    def list_users(self, page_token=None, max_results=1000):
+        start = int(page_token or 0)
+        page = self.users[start:start + max_results]
+        return types.SimpleNamespace(
+            users=page,
+            next_page_token=str(start + max_results) if start + max_results < len(self.users) else None,
+            iterate_all=lambda: iter(self.users[start:]),
+        )
+
+
+    def get_users(self, identifiers):
+        if self.failing_emails & set(identifiers):
+            raise ConnectionError("get_users failed")
+        emails = {email.lower() for email in identifiers}
+        return types.SimpleNamespace(users=[user for user in self.users if user.email.lower() in emails])
+
+    def import_users(self, records, hash_alg=None):
+        self.imported += [(record, hash_alg) for record in records]
+        self.users += [types.SimpleNamespace(uid=record.uid, email=record.email) for record in records]
+        return types.SimpleNamespace(errors=[])
+
+
+class StandInAppCheck:
+    def verify_token(self, token):
+        if token == "invalid":
+            raise ValueError("invalid App Check token")
+        return {"exp": time.time() + 3600}
+
+
+class StandInBackend:
+    def __init__(self):
+        self.auth = StandInAuth()
+        self.app_check = StandInAppCheck()
+        self.firestore = None
+
+
+@pytest.fixture
+def backend():
+    return StandInBackend()
+
+
+@pytest.fixture
+def make_app(backend):
+    """
+    create_app() with the stand-in backend, solves run in the request unless the config says otherwise
+    """
+    from cache import assignment_cache
+    from assign import create_app, users_cache
+
+    def make(**config):
+        assignment_cache.clear()
+        users_cache.clear()
+        return create_app({"AUTH_BACKEND": backend, "SOLVER_EXECUTOR": lambda: None, **config})
+
+    return make
+
+
+@pytest.fixture
+def client(make_app):
+    return make_app().test_client()
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+from conftest import TOKEN, UID
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_and_create_app_load_nothing_heavy(tmp_path):
+    # a fresh interpreter in an empty directory, like a cold start
+    script = (
+        "import sys\n"
+        f"sys.path.insert(0, {SERVICE_DIR!r})\n"
+        "import assign\n"
+        "assert not hasattr(assign, 'app')\n"
+        "app = assign.create_app()\n"
+        "heavy = [name for name in ('pulp', 'firebase_admin', 'smtplib', 'highspy') if name in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    env = {key: value for key, value in os.environ.items() if key not in ("RESUME_MAILINGS", "ASSIGN_WARM_UP")}
+
+    subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, check=True)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_apps_keep_their_own_backend_and_token_caches(make_app, backend):
+    first = make_app().test_client()
+    second = make_app().test_client()
+
+    first.get(f"/cache/stats?token={TOKEN}&uid={UID}")
+    stats = second.get(f"/cache/stats?token={TOKEN}&uid={UID}").get_json()
+
+    assert backend.auth.verified == 2
+    assert stats["id_tokens"] == {"entries": 1, "hits": 0, "misses": 1}
+
+
+def test_solve_can_be_replaced_by_the_config(make_app):
+    calls = []
+
+    def solve(preferences, projects, solver, options, start=None, executor=None):
+        calls.append((solver, executor))
+        return {
+            "solution": {student_id: "1" for student_id in preferences},
+            "status": "optimal", "objective": 1, "gap": 0, "time": 0, "state": None,
+        }
+
+    client = make_app(SOLVE=solve).test_client()
+    response = client.post("/assign?solver=cbc", json={
+        "token": TOKEN, "uid": UID, "preferences": {"a": {"selected": ["1"]}}, "projects": {"1": {"max": 1}},
+    })
+
+    assert response.get_json() == {"a": "1"}
+    assert calls == [("cbc", None)]
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from assign import MAX_BATCH_SIZE
+from benchmark.generator import generate_election
+from conftest import TOKEN, UID
+
+
+def assign_body(preferences, projects, **fields):
+    return {"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects, **fields}
+
+
+@pytest.mark.parametrize("time_limit", [0, "nan", -5])
+def test_assign_rejects_invalid_time_limits(client, time_limit):
+    preferences, projects = generate_election(10, 3, 0)
+
+    response = client.post(
+        "/assign?solver=flow", json=assign_body(preferences, projects, solver_options={"time_limit": time_limit})
+    )
+
+    assert response.status_code == 400
+
+
+def test_assign_without_solution_in_time_is_a_client_error(make_app):
+    def solve(*args, **kwargs):
+        raise TimeoutError("No assignment found within the time limit")
+
+    client = make_app(SOLVE=solve).test_client()
+    preferences, projects = generate_election(10, 3, 0)
+
+    response = client.post("/assign?solver=cbc", json=assign_body(preferences, projects))
+
+    assert response.status_code == 422
+    assert response.get_json()["error_type"] == "time_limit"
+
+
+def test_independent_groups_are_solved_as_components_on_the_pool(make_app, monkeypatch):
+    pytest.importorskip("pulp")
+    import decompose
+    from jobs import get_executor
+
+    monkeypatch.setattr(decompose, "MIN_PARALLEL_CHOICES", 0)
+    client = make_app(SOLVER_EXECUTOR=get_executor).test_client()
+    preferences, projects = {}, {}
+    for group in ("a", "b"):
+        group_preferences, group_projects = generate_election(30, 4, 5, "skewed", "overbooked")
+        projects.update({f"{group}-{key}": project for key, project in group_projects.items()})
+        preferences.update({
+            f"{group}-{key}": {**student, "selected": [f"{group}-{p}" for p in student["selected"]]}
+            for key, student in group_preferences.items()
+        })
+
+    response = client.post("/assign?solver=cbc", json=assign_body(preferences, projects))
+
+    assert response.status_code == 200
+    components = response.headers["X-Solver-Components"].split(",")
+    assert [component.split(":")[0] for component in components] == ["30", "30"]
+    whole = client.post("/assign?solver=flow", json=assign_body(preferences, projects))
+    assert float(response.headers["X-Solver-Objective"]) == float(whole.headers["X-Solver-Objective"])
+
+
+def test_batch_solves_every_problem_and_fails_bad_ones_alone(client):
+    preferences, projects = generate_election(40, 4, 6)
+    problems = [
+        {"id": "flow", "preferences": preferences, "projects": projects, "options": {"solver": "flow"}},
+        {"id": "unknown", "preferences": preferences, "projects": projects, "options": {"solver": "simplex"}},
+        {"id": "limit", "preferences": preferences, "projects": projects, "options": {"solver": "flow", "time_limit": 0}},
+        {"id": "missing", "projects": projects},
+    ]
+
+    response = client.post("/assign/batch", json={"token": TOKEN, "uid": UID, "problems": problems})
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["id"] for result in results] == ["flow", "unknown", "limit", "missing"]
+    assert set(results[0]["solution"]) == set(preferences)
+    assert results[0]["solver"] == "flow"
+    assert [result.get("error_type") for result in results[1:]] == ["invalid_problem"] * 3
+
+
+def test_batch_streams_one_line_per_problem(client):
+    preferences, projects = generate_election(20, 3, 7)
+    problems = [
+        {"id": index, "preferences": preferences, "projects": projects, "options": {"solver": "flow"}}
+        for index in range(3)
+    ]
+
+    response = client.post("/assign/batch?stream=1", json={"token": TOKEN, "uid": UID, "problems": problems})
+
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert len({line["objective"] for line in lines}) == 1
+
+
+@pytest.mark.parametrize("problems", [[], None, [{}] * (MAX_BATCH_SIZE + 1)])
+def test_batch_rejects_missing_or_too_many_problems(client, problems):
+    response = client.post("/assign/batch", json={"token": TOKEN, "uid": UID, "problems": problems})
+
+    assert response.status_code == 400
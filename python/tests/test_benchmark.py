@@ -0,0 +1,44 @@
+import pytest
+
+from benchmark.generator import CAPACITY, generate_election
+from benchmark.harness import compare, format_row, run_case
+
+
+def test_elections_are_reproducible_and_sized_by_the_capacity_ratio():
+    first = generate_election(200, 10, 5, "extreme", "overbooked", choices=4)
+
+    assert generate_election(200, 10, 5, "extreme", "overbooked", choices=4) == first
+    assert generate_election(200, 10, 6, "extreme", "overbooked", choices=4) != first
+    preferences, projects = first
+    assert sum(project["max"] for project in projects.values()) == round(200 * CAPACITY["overbooked"])
+    for student in preferences.values():
+        assert len(set(student["selected"])) == 4
+        assert len(student["points"]) == 4
+    with pytest.raises(ValueError):
+        generate_election(10, 2, choices=3)
+
+
+@pytest.mark.parametrize("solver", ["flow", "cbc"])
+def test_run_case_reports_every_phase(solver):
+    if solver == "cbc":
+        pytest.importorskip("pulp")
+
+    row = run_case(("small", 100, 5, "skewed", "tight"), solver, 0)
+
+    assert row["error"] is None
+    assert row["status"] == "optimal"
+    assert row["choices"] == 300
+    assert row["build"] >= 0
+    assert row["build"] + row["solve"] <= row["total"]
+    assert "objective" in format_row(row)
+
+
+def test_compare_reports_objective_and_time_changes():
+    def report(objective, total):
+        return {"results": [{"case": "small", "solver": "flow", "objective": objective, "total": total, "error": None}]}
+
+    assert compare(report(10, 1.0), report(10, 1.05)) == []
+    assert compare(report(10, 1.0), report(12, 2.0)) == [
+        "small flow: objective 10 -> 12",
+        "small flow: total 1.000s -> 2.000s (2.00x)",
+    ]
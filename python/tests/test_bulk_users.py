@@ -0,0 +1,63 @@
+import hashlib
+import types
+
+import pytest
+
+import bulk_users
+from conftest import TOKEN, UID
+
+
+@pytest.fixture(autouse=True)
+def cheap_scrypt(monkeypatch):
+    # the production cost takes a good part of a second per password
+    monkeypatch.setattr(bulk_users, "SCRYPT_COST", 2 ** 4)
+
+
+def bulk(client, entries):
+    return client.post(f"/users/bulk?token={TOKEN}&uid={UID}", json={"users": entries})
+
+
+def test_created_passwords_are_hashed_with_scrypt(client, backend):
+    response = bulk(client, [{"action": "create", "email": "a@example.com", "password": "secret1"}])
+
+    assert response.status_code == 200
+    assert response.get_json()["success_count"] == 1
+    (record, (algorithm, params)), = backend.auth.imported
+    assert algorithm == "standard_scrypt"
+    assert record.password_hash == hashlib.scrypt(
+        b"secret1",
+        salt=record.password_salt,
+        n=params["memory_cost"],
+        r=params["block_size"],
+        p=params["parallelization"],
+        dklen=params["derived_key_length"],
+    )
+
+
+def test_existing_and_repeated_emails_are_rejected_per_row(client, backend):
+    backend.auth.users.append(types.SimpleNamespace(uid="old", email="Taken@example.com"))
+
+    response = bulk(client, [
+        {"action": "create", "email": "taken@example.com", "password": "secret1"},
+        {"action": "create", "email": "twice@example.com", "password": "secret1"},
+        {"action": "create", "email": "TWICE@example.com", "password": "secret1"},
+        {"action": "create", "email": "new@example.com", "password": "secret1"},
+    ])
+
+    results = response.get_json()["results"]
+    assert [result["success"] for result in results] == [False, False, False, True]
+    assert [record.email for record, _ in backend.auth.imported] == ["new@example.com"]
+
+
+def test_failed_lookup_fails_only_the_rows_of_its_chunk(client, backend, monkeypatch):
+    monkeypatch.setattr(bulk_users, "LOOKUP_BATCH_SIZE", 2)
+    backend.auth.failing_emails = {"c@example.com"}
+    emails = ["a@example.com", "b@example.com", "c@example.com", "d@example.com", "e@example.com"]
+
+    response = bulk(client, [{"action": "create", "email": email, "password": "secret1"} for email in emails])
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["success"] for result in results] == [True, True, False, False, True]
+    assert "get_users failed" in results[2]["error"]
+    assert [record.email for record, _ in backend.auth.imported] == [emails[0], emails[1], emails[4]]
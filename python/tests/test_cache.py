@@ -0,0 +1,66 @@
+from cache import ResultCache, assignment_key
+from conftest import TOKEN, UID
+from solver import DEFAULT_POINTS, parse_solver_options
+
+PREFERENCES = {"1": {"selected": [1, 2, 3]}, "2": {"selected": [2, 1, 3]}, "3": {"selected": [1, 3, 2]}}
+PROJECTS = {"1": {"title": "Project 1", "max": 1}, "2": {"title": "Project 2", "max": 1}, "3": {"title": "Project 3", "max": 1}}
+
+
+def assign(client, preferences=PREFERENCES, projects=PROJECTS):
+    return client.post(
+        "/assign?solver=flow", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects}
+    )
+
+
+def test_repeated_assignment_is_a_hit_until_the_cache_is_cleared(client):
+    first = assign(client)
+    second = assign(client)
+
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == first.get_json()
+    assert second.headers["X-Solver-Objective"] == first.headers["X-Solver-Objective"]
+
+    cleared = client.delete(f"/assign/cache?token={TOKEN}&uid={UID}")
+
+    assert cleared.get_json()["removed"] == 1
+    assert assign(client).headers["X-Cache"] == "MISS"
+
+
+def test_changed_input_is_a_miss(client):
+    assign(client)
+
+    changed = {**PROJECTS, "3": {"title": "Project 3", "max": 2}}
+
+    assert assign(client, projects=changed).headers["X-Cache"] == "MISS"
+
+
+def test_clearing_the_cache_needs_a_signed_in_admin(client):
+    assign(client)
+
+    assert client.delete(f"/assign/cache?token=other&uid={UID}").status_code == 401
+    assert assign(client).headers["X-Cache"] == "HIT"
+
+
+def test_key_ignores_titles_order_and_explicit_default_points():
+    options = parse_solver_options(None)
+    explicit = {
+        student_id: {**student, "points": DEFAULT_POINTS} for student_id, student in reversed(PREFERENCES.items())
+    }
+    renamed = {project_id: {"title": "Renamed", "max": project["max"]} for project_id, project in PROJECTS.items()}
+
+    assert assignment_key(explicit, renamed, "flow", options) == assignment_key(PREFERENCES, PROJECTS, "flow", options)
+    assert assignment_key(PREFERENCES, PROJECTS, "cbc", options) != assignment_key(PREFERENCES, PROJECTS, "flow", options)
+
+
+def test_cache_evicts_the_least_recently_used_entry():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,181 @@
+import pytest
+
+import elections
+from conftest import TOKEN, UID
+from elections import choice_points, load_election, paged, parse_rules, write_results
+
+
+class Snapshot:
+    def __init__(self, path, data):
+        self.id = path.rsplit("/", 1)[-1]
+        self.path = path
+        self.exists = data is not None
+        self.data = data
+
+    def to_dict(self):
+        return dict(self.data) if self.data is not None else None
+
+
+class Query:
+    def __init__(self, db, path, after=None, size=None):
+        self.db, self.path, self.after, self.size = db, path, after, size
+
+    def select(self, fields):
+        return self
+
+    def order_by(self, field):
+        return self
+
+    def limit(self, size):
+        return Query(self.db, self.path, self.after, size)
+
+    def start_after(self, snapshot):
+        return Query(self.db, self.path, snapshot.id, self.size)
+
+    def get(self):
+        self.db.reads += 1
+        prefix = self.path + "/"
+        ids = sorted(
+            path[len(prefix):] for path in self.db.documents if path.startswith(prefix) and "/" not in path[len(prefix):]
+        )
+        ids = [doc_id for doc_id in ids if self.after is None or doc_id > self.after][:self.size]
+        return [Snapshot(f"{prefix}{doc_id}", self.db.documents[f"{prefix}{doc_id}"]) for doc_id in ids]
+
+
+class Document:
+    def __init__(self, db, path):
+        self.db, self.path = db, path
+
+    def get(self, field_paths=None):
+        return Snapshot(self.path, self.db.documents.get(self.path))
+
+    def collection(self, name):
+        return Collection(self.db, f"{self.path}/{name}")
+
+
+class Collection(Query):
+    def document(self, doc_id):
+        return Document(self.db, f"{self.path}/{doc_id}")
+
+
+class Batch:
+    def __init__(self, db):
+        self.db, self.writes = db, []
+
+    def set(self, document, data, merge=False):
+        self.writes.append((document.path, data))
+
+    def commit(self):
+        self.db.commits.append(len(self.writes))
+        for path, data in self.writes:
+            self.db.documents[path] = {**self.db.documents.get(path, {}), **data}
+
+
+class StandInFirestore:
+    """
+    The parts of a Firestore client elections.py uses, backed by {path: data}
+    """
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.reads = 0
+        self.commits = []
+
+    def collection(self, name):
+        return Collection(self, name)
+
+    def get_all(self, references, field_paths=None):
+        return [reference.get() for reference in references]
+
+    def batch(self):
+        return Batch(self)
+
+
+@pytest.fixture
+def firestore(backend):
+    backend.firestore = StandInFirestore({
+        "votes/v1": {"title": "Projektwoche"},
+        "votes/v1/options/a": {"title": "Theater", "max": 1},
+        "votes/v1/options/b": {"title": "Chor", "max": 2},
+        "votes/v1/options/unused": {"title": "Nobody", "max": 5},
+        "votes/v1/choices/c1": {"selected": ["a", "b"], "grade": "12", "name": "Anna"},
+        "votes/v1/choices/c2": {"selected": ["a", "gone", "b"], "grade": "11", "name": "Ben"},
+        "votes/v1/choices/c3": {"selected": ["b", "a"], "grade": "12b", "name": "Cara"},
+    })
+    return backend.firestore
+
+
+def test_vote_is_loaded_with_the_points_of_the_rules(firestore):
+    rules = [{"apply": "*", "scores": [1, 3, 9]}, {"apply": "grade=12", "scores": [1, 10]}]
+
+    preferences, projects = load_election(firestore, "v1", rules)
+
+    assert projects == {"a": {"title": "Theater", "max": 1}, "b": {"title": "Chor", "max": 2}}
+    assert preferences == {
+        "c1": {"selected": ["a", "b"], "points": [1, 10]},
+        # an option that no longer exists is skipped together with its points
+        "c2": {"selected": ["a", "b"], "points": [1, 9]},
+        "c3": {"selected": ["b", "a"], "points": [1, 10]},
+    }
+    assert load_election(firestore, "missing") is None
+
+
+def test_choices_are_read_page_by_page(firestore):
+    choices = firestore.collection("votes").document("v1").collection("choices")
+
+    assert [snapshot.id for snapshot in paged(choices, page_size=2)] == ["c1", "c2", "c3"]
+    assert firestore.reads == 2
+
+
+def test_results_are_written_in_batches(firestore, monkeypatch):
+    monkeypatch.setattr(elections, "FIRESTORE_BATCH_SIZE", 2)
+
+    written = write_results(firestore, "v1", {"c1": "a", "c2": "b", "c3": "b"})
+
+    assert written == 3
+    assert firestore.commits == [2, 1]
+    assert firestore.documents["votes/v1/results/c2"] == {"result": "b"}
+
+
+@pytest.mark.parametrize("apply, matches", [
+    ("*", True), ("grade=12", True), ("grade=11", False), ("name=ann", True),
+    ("listIndex=3", True), ("grade=12,selected=x", False), ("selected=b", True),
+])
+def test_rules_match_like_the_assign_page(apply, matches):
+    choice = {"grade": "12", "name": "Anna", "listIndex": 3, "selected": ["a", "b"]}
+
+    assert (choice_points(choice, [{"apply": apply, "scores": [5]}]) == [5]) is matches
+
+
+@pytest.mark.parametrize("rules", ["*", [{"scores": [1]}], [{"apply": "*", "scores": ["1"]}]])
+def test_invalid_rules_are_rejected(rules):
+    with pytest.raises(ValueError):
+        parse_rules(rules)
+
+
+def test_assign_solves_a_stored_vote_and_writes_the_results(client, firestore):
+    response = client.post("/assign?solver=flow", json={
+        "token": TOKEN, "uid": UID, "election": "v1", "write_results": True,
+        "rules": [{"apply": "*", "scores": [1, 5]}],
+    })
+
+    assert response.status_code == 200
+    solution = response.get_json()
+    assert sorted(solution.values()) == ["a", "b", "b"]
+    assert response.headers["X-Results-Written"] == "3"
+    assert {firestore.documents[f"votes/v1/results/{choice_id}"]["result"] for choice_id in solution} == {"a", "b"}
+
+
+def test_assign_of_an_unknown_vote_is_not_found(client, firestore):
+    response = client.post("/assign?solver=flow", json={"token": TOKEN, "uid": UID, "election": "missing"})
+
+    assert response.status_code == 404
+    assert response.get_json()["error_type"] == "not_found"
+
+
+def test_write_results_needs_an_election(client):
+    response = client.post("/assign?solver=flow", json={
+        "token": TOKEN, "uid": UID, "preferences": {}, "projects": {}, "write_results": True,
+    })
+
+    assert response.status_code == 400
@@ -0,0 +1,48 @@
+import uuid
+
+import pytest
+
+from benchmark.generator import generate_election
+from conftest import TOKEN, UID
+from incremental import election_diff
+from solver import parse_solver_options, solve_assignment
+
+
+@pytest.mark.parametrize("solver", ["flow", "cbc"])
+def test_resolve_of_an_election_reports_the_diff_and_stays_optimal(client, solver):
+    if solver == "cbc":
+        pytest.importorskip("pulp")
+    election = uuid.uuid4().hex
+    preferences, projects = generate_election(120, 8, 4, "skewed", "overbooked")
+
+    def assign(preferences, projects):
+        return client.post(
+            f"/assign?solver={solver}",
+            json={"token": TOKEN, "uid": UID, "election": election, "preferences": preferences, "projects": projects},
+        )
+
+    first = assign(preferences, projects)
+    assert "X-Incremental" not in first.headers
+
+    student_id = next(iter(preferences))
+    changed = {**preferences, student_id: {**preferences[student_id], "selected": preferences[student_id]["selected"][::-1]}}
+    project_id = next(iter(projects))
+    resized = {**projects, project_id: {**projects[project_id], "max": int(projects[project_id]["max"]) + 2}}
+
+    second = assign(changed, resized)
+
+    assert second.status_code == 200
+    assert second.headers["X-Incremental"] == "added=0;removed=0;changed=1;capacities=1"
+    cold = solve_assignment(changed, resized, solver, parse_solver_options(None))
+    assert float(second.headers["X-Solver-Objective"]) == pytest.approx(cold["objective"])
+
+
+def test_diff_counts_students_and_capacities():
+    previous = {
+        "preferences": {"a": {"selected": [1, 2]}, "b": {"selected": [2, 1]}},
+        "projects": {"1": {"max": 1}, "2": {"max": 1}},
+    }
+    preferences = {"a": {"selected": [1, 2], "points": [1, 2, 4]}, "c": {"selected": [1]}}
+    projects = {"1": {"max": 2}, "3": {"max": 1}}
+
+    assert election_diff(previous, preferences, projects) == {"added": 1, "removed": 1, "changed": 0, "capacities": 3}
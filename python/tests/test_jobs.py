@@ -0,0 +1,95 @@
+import json
+import time
+
+import jobs
+from benchmark.generator import generate_election
+from conftest import TOKEN, UID
+from jobs import JobStore
+from solver import parse_solver_options, solve_assignment
+
+
+def wait_for_job(client, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/assign/jobs/{job_id}?token={TOKEN}&uid={UID}").get_json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_async_job_runs_on_the_pool_and_reports_the_result(client):
+    preferences, projects = generate_election(80, 6, 3)
+
+    response = client.post(
+        "/assign?solver=flow&async=1", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects}
+    )
+
+    assert response.status_code == 202
+    assert response.get_json()["status"] == "queued"
+    job = wait_for_job(client, response.get_json()["job_id"])
+    assert job["status"] == "done"
+    assert job["progress"] == 1.0
+    assert job["error"] is None
+    expected = solve_assignment(preferences, projects, "flow", parse_solver_options(None))
+    assert job["objective"] == expected["objective"]
+    assert set(job["result"]) == set(preferences)
+
+    # the finished job fills the cache of the synchronous endpoint
+    cached = client.post(
+        "/assign?solver=flow", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects}
+    )
+    assert cached.headers["X-Cache"] == "HIT"
+
+
+def test_failed_job_reports_the_error(client):
+    response = client.post(
+        "/assign?solver=flow&async=1",
+        json={"token": TOKEN, "uid": UID, "preferences": {"s": {"selected": ["missing"]}}, "projects": {"p": {"max": 1}}},
+    )
+
+    job = wait_for_job(client, response.get_json()["job_id"])
+    assert job["status"] == "failed"
+    assert job["error_type"] == "solve_failed"
+    assert job["result"] is None
+
+
+def test_unknown_job_and_full_queue(client, monkeypatch):
+    assert client.get(f"/assign/jobs/unknown?token={TOKEN}&uid={UID}").status_code == 404
+
+    monkeypatch.setattr(jobs, "MAX_QUEUED_JOBS", -jobs.MAX_WORKERS)
+    preferences, projects = generate_election(10, 3, 0)
+    response = client.post(
+        "/assign?solver=flow&async=1", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects}
+    )
+    assert response.status_code == 503
+    assert response.get_json()["error_type"] == "queue_full"
+
+
+def test_store_fails_jobs_of_stopped_processes_only(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    store.put({"id": "mine", "status": "running"})
+    # a job of a process that stopped and one of a live worker on another host
+    store.db.execute(
+        "INSERT INTO jobs (id, record, owner) VALUES (?, ?, ?), (?, ?, ?)",
+        ("stopped", json.dumps({"id": "stopped", "status": "running"}), "",
+         "remote", json.dumps({"id": "remote", "status": "queued"}), "other-host:1"),
+    )
+    store.db.commit()
+
+    reopened = JobStore(path)
+
+    assert reopened.get("stopped")["status"] == "failed"
+    assert reopened.get("remote")["status"] == "queued"
+    # a row of this very process is left over from before a restart with a reused pid
+    assert reopened.get("mine")["status"] == "failed"
+
+
+def test_late_progress_does_not_reset_a_finished_job():
+    store = JobStore()
+    store.put({"id": "job", "status": "done", "progress": 1.0})
+
+    store.update("job", active_only=True, status="running", progress=0.3)
+
+    assert store.get("job")["status"] == "done"
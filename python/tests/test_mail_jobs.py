@@ -0,0 +1,150 @@
+import os
+import smtplib
+import stat
+import time
+
+import pytest
+
+import mail_jobs
+from conftest import TOKEN, UID
+from mail_jobs import MailQueue
+from test_mailer import SMTP_CONFIG, FakeSMTP, recipients
+
+
+class FlakySMTP(FakeSMTP):
+    """
+    Refuses the data of every recipient in `failing` the first `failures` times
+    """
+
+    failing = set()
+    failures = 1
+    attempts = {}
+
+    def sendmail(self, from_address, to_address, text):
+        with FakeSMTP.lock:
+            FlakySMTP.attempts[to_address] = FlakySMTP.attempts.get(to_address, 0) + 1
+            failed = to_address in FlakySMTP.failing and FlakySMTP.attempts[to_address] <= FlakySMTP.failures
+        if failed:
+            raise smtplib.SMTPDataError(451, b"Try again later")
+        super().sendmail(from_address, to_address, text)
+
+
+@pytest.fixture(autouse=True)
+def flaky_smtp(monkeypatch):
+    FakeSMTP.connections = 0
+    FakeSMTP.sent = []
+    FlakySMTP.failing = set()
+    FlakySMTP.failures = 1
+    FlakySMTP.attempts = {}
+    monkeypatch.setattr(smtplib, "SMTP", FlakySMTP)
+    return FlakySMTP
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    queue = MailQueue(str(tmp_path / "instance" / "mail_jobs.db"))
+    monkeypatch.setattr(mail_jobs, "_queue", queue)
+    monkeypatch.setattr(mail_jobs, "MAIL_RETRY_DELAY", 0.01)
+    return queue
+
+
+def run_once(queue, owner="worker"):
+    # one pass of the background worker, without its thread
+    job_id = queue.claim(owner)
+    assert job_id is not None
+    try:
+        mail_jobs._send_due(job_id, owner)
+    finally:
+        queue.release(job_id)
+    return job_id
+
+
+def test_queued_mailing_is_sent_in_the_background(client, queue):
+    response = client.post("/send-email?async=1", json={
+        "token": TOKEN,
+        "uid": UID,
+        "recipients": [{"email": email, "variables": {"name": email}} for email in recipients(4)],
+        "subject": "Hallo {{name}}",
+        "body": "<p>Hallo</p>",
+        "smtp_config": SMTP_CONFIG,
+    })
+
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    deadline = time.time() + 10
+    while (job := client.get(f"/send-email/jobs/{job_id}?token={TOKEN}&uid={UID}").get_json())["status"] != "done":
+        assert time.time() < deadline, job
+        time.sleep(0.02)
+    assert (job["total"], job["sent"], job["failed"], job["pending"]) == (4, 4, 0, 0)
+    # the credentials are removed once the mailing is finished
+    assert queue.job(job_id)["smtp_config"] is None
+
+
+def test_transient_errors_are_retried_with_backoff(queue, flaky_smtp):
+    flaky_smtp.failing = {"student1@example.com"}
+    job_id = queue.add(SMTP_CONFIG, "Hallo", "body", recipients(3), [None] * 3)
+
+    run_once(queue)
+
+    progress = queue.progress(job_id)
+    assert (progress["status"], progress["sent"], progress["pending"]) == ("running", 2, 1)
+    assert progress["next_attempt"] > time.time() - 1
+    time.sleep(0.05)
+
+    run_once(queue)
+
+    progress = queue.progress(job_id)
+    assert (progress["status"], progress["sent"], progress["failed"]) == ("done", 3, 0)
+    assert flaky_smtp.attempts["student1@example.com"] == 2
+
+
+def test_recipients_fail_after_the_last_attempt(queue, flaky_smtp, monkeypatch):
+    monkeypatch.setattr(mail_jobs, "MAIL_MAX_ATTEMPTS", 2)
+    flaky_smtp.failing = {"student0@example.com"}
+    flaky_smtp.failures = 10
+    job_id = queue.add(SMTP_CONFIG, "Hallo", "body", recipients(1), [None])
+
+    run_once(queue)
+    time.sleep(0.05)
+    run_once(queue)
+
+    progress = queue.progress(job_id)
+    assert progress["status"] == "done"
+    (failed,) = progress["failed_emails"]
+    assert (failed["error_type"], failed["attempts"]) == ("data_error", 2)
+
+
+def test_refused_recipients_are_not_retried(queue):
+    job_id = queue.add(SMTP_CONFIG, "Hallo", "body", recipients(1), [None])
+    queue.claim("worker")
+
+    queue.record(job_id, 0, "worker", {"error": "refused", "error_type": "recipient_refused"})
+
+    assert queue.progress(job_id)["failed"] == 1
+    assert queue.next_attempt() is None
+
+
+def test_a_mailing_is_leased_to_one_worker_until_the_lease_expires(queue, monkeypatch):
+    job_id = queue.add(SMTP_CONFIG, "Hallo", "body", recipients(2), [None] * 2)
+
+    assert queue.claim("first") == job_id
+    assert queue.claim("second") is None
+
+    # progress of the owner extends the lease, a stalled owner loses it
+    monkeypatch.setattr(mail_jobs, "MAIL_LEASE", -1)
+    queue.record(job_id, 0, "first")
+
+    assert queue.claim("second") == job_id
+    monkeypatch.setattr(mail_jobs, "MAIL_LEASE", 120)
+    queue.record(job_id, 1, "first")
+    assert queue.job(job_id)["lease_owner"] == "second"
+    assert queue.job(job_id)["lease_until"] < time.time()
+
+
+def test_queue_file_is_private_and_needs_an_absolute_path(queue, tmp_path):
+    path = tmp_path / "instance" / "mail_jobs.db"
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(path.parent).st_mode) == 0o700
+    with pytest.raises(ValueError):
+        MailQueue("mail_jobs.db")
@@ -0,0 +1,146 @@
+import email
+import email.header
+import smtplib
+import threading
+
+import pytest
+
+import mailer
+from mailer import send_email, smtp_limits
+
+SMTP_CONFIG = {"server": "smtp.example.com", "port": 587, "username": "schule@example.com", "password": "secret"}
+
+
+class FakeSMTP:
+    """
+    smtplib.SMTP stand-in that records the sent messages and can refuse extra connections
+    """
+
+    max_connections = None
+    connections = 0
+    opened = 0
+    sent = []
+    lock = threading.Lock()
+
+    def __init__(self, host, port):
+        with FakeSMTP.lock:
+            if FakeSMTP.max_connections is not None and FakeSMTP.connections >= FakeSMTP.max_connections:
+                raise smtplib.SMTPConnectError(421, b"Too many connections")
+            FakeSMTP.connections += 1
+            FakeSMTP.opened += 1
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def sendmail(self, from_address, to_address, text):
+        # smtplib sends string messages as ASCII
+        text.encode("ascii")
+        with FakeSMTP.lock:
+            FakeSMTP.sent.append((to_address, text))
+
+    def quit(self):
+        with FakeSMTP.lock:
+            FakeSMTP.connections -= 1
+
+
+@pytest.fixture(autouse=True)
+def fake_smtp(monkeypatch):
+    FakeSMTP.max_connections = None
+    FakeSMTP.connections = 0
+    FakeSMTP.opened = 0
+    FakeSMTP.sent = []
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+
+def recipients(count):
+    return [f"student{i}@example.com" for i in range(count)]
+
+
+def test_mailing_is_sent_over_the_pool(fake_smtp):
+    result = send_email(recipients(40), "Ergebnis", "<p>Hallo</p>", {**SMTP_CONFIG, "pool_size": 4})
+
+    assert result["success"] and result["sent_count"] == 40
+    assert sorted(to for to, _ in fake_smtp.sent) == sorted(recipients(40))
+    assert fake_smtp.connections == 0
+
+
+def test_pool_shrinks_when_the_server_refuses_extra_connections(fake_smtp):
+    fake_smtp.max_connections = 1
+
+    result = send_email(recipients(40), "Ergebnis", "<p>Hallo</p>", {**SMTP_CONFIG, "pool_size": 4})
+
+    assert result["success"] and result["sent_count"] == 40
+    assert "failed_emails" not in result
+
+
+def test_invalid_limits_are_rejected_before_connecting(fake_smtp):
+    result = send_email(recipients(2), "Ergebnis", "Hallo", {**SMTP_CONFIG, "pool_size": "many"})
+
+    assert result["error_type"] == "invalid_config"
+    assert fake_smtp.opened == 0
+
+
+def test_clients_cannot_lift_the_server_limits(monkeypatch):
+    monkeypatch.setattr(mailer, "SMTP_POOL_SIZE", 4)
+    monkeypatch.setattr(mailer, "SMTP_RATE_LIMIT", 10.0)
+    monkeypatch.setattr(mailer, "SMTP_MESSAGES_PER_CONNECTION", 100)
+
+    assert smtp_limits({"pool_size": 50, "rate_limit": 0, "messages_per_connection": 0}) == (4, 100, 10.0)
+    assert smtp_limits({"rate_limit": -1}) == (4, 100, 10.0)
+    assert smtp_limits({"pool_size": 2, "rate_limit": 2.5, "messages_per_connection": 20}) == (2, 20, 2.5)
+    with pytest.raises(ValueError):
+        smtp_limits({"rate_limit": "nan"})
+
+
+def message_parts(text):
+    message = email.message_from_string(text)
+    subject = str(email.header.make_header(email.header.decode_header(message["Subject"])))
+    sender = str(email.header.make_header(email.header.decode_header(message["From"])))
+    body = message.get_payload()[0].get_payload(decode=True).decode("utf-8")
+    return subject, sender, body
+
+
+def test_every_recipient_gets_their_own_variables(fake_smtp):
+    emails = recipients(3)
+    variables = [{"name": f"Schüler {i}", "project": f"Projekt {i}"} for i in range(3)]
+
+    result = send_email(
+        emails, "Zuteilung für {{name}}", "<p>{{name}}: {{project}} {{unknown}}</p>", SMTP_CONFIG, variables
+    )
+
+    assert result["success"]
+    for to_address, text in fake_smtp.sent:
+        i = emails.index(to_address)
+        subject, _, body = message_parts(text)
+        assert subject == f"Zuteilung für Schüler {i}"
+        assert body == f"<p>Schüler {i}: Projekt {i} {{{{unknown}}}}</p>"
+
+
+def test_variables_cannot_add_headers(fake_smtp):
+    send_email(recipients(1), "{{name}}", "body", SMTP_CONFIG, [{"name": "Anna\nBcc: everyone@example.com"}])
+
+    (_, text), = fake_smtp.sent
+    assert "\nBcc:" not in text
+    assert message_parts(text)[0] == "Anna Bcc: everyone@example.com"
+
+
+def test_non_ascii_sender_names_are_encoded(fake_smtp):
+    config = {**SMTP_CONFIG, "from_address": "Schule Müller <schule@example.com>"}
+
+    assert send_email(recipients(1), "Hallo", "body", config)["success"]
+
+    (_, text), = fake_smtp.sent
+    assert message_parts(text)[1] == "Schule Müller <schule@example.com>"
+
+
+def test_line_breaks_in_the_sender_are_rejected(fake_smtp):
+    config = {**SMTP_CONFIG, "from_address": "schule@example.com\r\nBcc: everyone@example.com"}
+
+    result = send_email(recipients(1), "Hallo", "body", config)
+
+    assert not result["success"]
+    assert fake_smtp.sent == []
@@ -0,0 +1,82 @@
+import json
+import logging
+
+import pytest
+
+import assign
+import mail_jobs
+from benchmark.generator import generate_election
+from conftest import TOKEN, UID
+from logs import JsonFormatter
+from metrics import CONTENT_TYPE, Registry
+
+
+@pytest.fixture
+def metrics_token(monkeypatch, tmp_path):
+    monkeypatch.setattr(assign, "METRICS_TOKEN", "scrape-secret")
+    # the jobs_in_flight gauge counts the mailings of the queue
+    monkeypatch.setattr(mail_jobs, "_queue", None)
+    monkeypatch.setattr(mail_jobs, "MAIL_JOB_DB", str(tmp_path / "mail_jobs.db"))
+    return "scrape-secret"
+
+
+def test_metrics_are_disabled_without_a_token(client):
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+
+
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", "scrape-secret", f"Bearer {TOKEN}"])
+def test_metrics_need_the_token(client, metrics_token, authorization):
+    headers = {"Authorization": authorization} if authorization else {}
+
+    assert client.get("/metrics", headers=headers).status_code == 401
+
+
+def test_metrics_count_solves_and_phases(client, metrics_token):
+    preferences, projects = generate_election(30, 4, 1)
+    solved = client.post(
+        "/assign?solver=flow", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects}
+    )
+    assert "solve;dur=" in solved.headers["Server-Timing"]
+
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {metrics_token}"})
+
+    assert response.status_code == 200
+    assert response.content_type == CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert 'solver_results_total{solver="flow",status="optimal"}' in text
+    assert 'request_phase_duration_seconds_count{phase="solve"}' in text
+    assert 'http_request_duration_seconds_count{endpoint="/assign",method="POST",status="200"}' in text
+    assert 'jobs_in_flight{kind="mail"} 0' in text
+
+
+def test_request_log_has_sizes_but_no_payload(client, caplog):
+    preferences = {"1": {"name": "Johan", "selected": [1, 2]}, "2": {"name": "Sara", "selected": [2, 1]}}
+    projects = {"1": {"title": "Project 1", "max": 1}, "2": {"title": "Project 2", "max": 1}}
+
+    with caplog.at_level(logging.INFO, logger="assign"):
+        client.post("/assign?solver=flow", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects})
+
+    (record,) = [record for record in caplog.records if getattr(record, "fields", {}).get("endpoint") == "/assign"]
+    line = JsonFormatter().format(record)
+    assert json.loads(line)["students"] == 2
+    assert json.loads(line)["choices"] == 4
+    assert "Johan" not in line and TOKEN not in line
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("phase",), buckets=(0.1, 1))
+    histogram.observe(0.05, phase="solve")
+    histogram.observe(0.5, phase="solve")
+    histogram.observe(5, phase="solve")
+
+    lines = registry.render().splitlines()
+
+    assert lines[2:] == [
+        'latency_seconds_bucket{phase="solve",le="0.1"} 1',
+        'latency_seconds_bucket{phase="solve",le="1"} 2',
+        'latency_seconds_bucket{phase="solve",le="+Inf"} 3',
+        'latency_seconds_sum{phase="solve"} 5.55',
+        'latency_seconds_count{phase="solve"} 3',
+    ]
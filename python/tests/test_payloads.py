@@ -0,0 +1,111 @@
+import pytest
+
+from benchmark.generator import generate_election
+from conftest import TOKEN, UID
+from payloads import from_columnar, to_columnar
+
+
+def columnar(preferences, projects):
+    project_ids = list(projects)
+    index = {project_id: j for j, project_id in enumerate(project_ids)}
+    width = max(len(student["selected"]) for student in preferences.values())
+    return {
+        "students": list(preferences),
+        "projects": project_ids,
+        "max": [projects[project_id]["max"] for project_id in project_ids],
+        "width": width,
+        "choices": [
+            index[project_id] if rank < len(student["selected"]) else -1
+            for student in preferences.values()
+            for rank, project_id in enumerate(student["selected"] + [None] * (width - len(student["selected"])))
+        ],
+        "points": [
+            value for student in preferences.values()
+            for value in student["points"] + [0] * (width - len(student["points"]))
+        ],
+    }
+
+
+def test_columnar_body_converts_to_the_object_form():
+    preferences, projects = generate_election(20, 5, 1)
+    preferences["s3"] = {"selected": ["p1"], "points": [7]}
+
+    converted, converted_projects = from_columnar(columnar(preferences, projects))
+
+    assert converted == preferences
+    assert converted_projects == {project_id: {"max": project["max"]} for project_id, project in projects.items()}
+
+
+def test_shared_and_default_points():
+    data = {"students": [1, 2], "projects": ["a", "b"], "max": [1, 1], "choices": [0, 1, 1, -1]}
+
+    preferences, _ = from_columnar(data)
+    shared, _ = from_columnar({**data, "points": [3, 1]})
+
+    assert preferences == {"1": {"selected": ["a", "b"], "points": [1, 2, 4]}, "2": {"selected": ["b"], "points": [1]}}
+    assert shared["1"]["points"] == [3, 1]
+    assert to_columnar({"1": "b"}, data) == {"assignment": [1, -1]}
+
+
+@pytest.mark.parametrize("change", [
+    {"max": [1]},
+    {"choices": [0, 1, 1]},
+    {"choices": [0, 1, 1, 2]},
+    {"choices": [0, 1, 1.0, -1]},
+    {"points": [1, 2, 3]},
+])
+def test_inconsistent_columns_are_rejected(client, change):
+    data = {"students": [1, 2], "projects": ["a", "b"], "max": [1, 1], "choices": [0, 1, 1, -1], **change}
+
+    response = client.post("/assign?solver=flow", json={"token": TOKEN, "uid": UID, **data})
+
+    assert response.status_code == 400
+
+
+def test_columnar_request_gets_a_columnar_answer(client):
+    preferences, projects = generate_election(60, 6, 2)
+    data = columnar(preferences, projects)
+
+    response = client.post("/assign?solver=flow", json={"token": TOKEN, "uid": UID, **data})
+    objects = client.post("/assign?solver=flow", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects})
+
+    assignment = response.get_json()["assignment"]
+    assert assignment == [data["projects"].index(objects.get_json()[student_id]) for student_id in data["students"]]
+    assert response.headers["X-Solver-Objective"] == objects.headers["X-Solver-Objective"]
+
+
+def test_messagepack_request_and_accept(client):
+    msgpack = pytest.importorskip("msgpack")
+    preferences, projects = generate_election(30, 4, 3)
+    body = {"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects}
+
+    packed = client.post("/assign?solver=flow", data=msgpack.packb(body), content_type="application/msgpack")
+    accepted = client.post("/assign?solver=flow", json=body, headers={"Accept": "application/x-msgpack"})
+    plain = client.post("/assign?solver=flow", json=body)
+
+    assert packed.mimetype == accepted.mimetype == "application/msgpack"
+    assert msgpack.unpackb(packed.get_data()) == msgpack.unpackb(accepted.get_data()) == plain.get_json()
+    assert "Accept" in plain.headers["Vary"]
+
+
+def test_invalid_messagepack_is_a_client_error(client):
+    pytest.importorskip("msgpack")
+
+    response = client.post("/assign", data=b"\xc1", content_type="application/msgpack")
+
+    assert response.status_code == 400
+
+
+def test_orjson_responses_match_flask(make_app):
+    pytest.importorskip("orjson")
+    from flask.json.provider import DefaultJSONProvider
+
+    app = make_app()
+    value = {"b": [1, 2.5, None], "a": {"2": "ü", "1": True}}
+
+    with app.app_context():
+        body = app.json.response(value).get_data(as_text=True)
+        expected = DefaultJSONProvider(app).response(value).get_data(as_text=True)
+
+    # the same document with sorted keys, orjson only leaves non-ASCII characters unescaped
+    assert body == expected.replace("\\u00fc", "ü")
@@ -0,0 +1,51 @@
+import pytest
+
+from benchmark.generator import generate_election
+from conftest import TOKEN, UID
+from preview import preview_assignment
+from solver import parse_solver_options, solve_assignment
+
+# (seed, students, projects, popularity, capacity)
+ELECTIONS = [
+    (0, 50, 5, "uniform", "loose"),
+    (1, 200, 10, "skewed", "tight"),
+    (2, 300, 12, "extreme", "overbooked"),
+]
+
+
+@pytest.mark.parametrize("election", ELECTIONS, ids=lambda election: f"seed{election[0]}")
+def test_preview_is_bracketed_by_its_lower_bound_and_the_optimum(election):
+    seed, students, projects, popularity, capacity = election
+    preferences, election_projects = generate_election(students, projects, seed, popularity, capacity)
+
+    result = preview_assignment(preferences, election_projects)
+
+    optimum = solve_assignment(preferences, election_projects, "flow", parse_solver_options(None))["objective"]
+    assert set(result["solution"]) == set(preferences)
+    assert result["lower_bound"] <= optimum + 1e-6
+    assert result["objective"] >= optimum - 1e-6
+    assert result["gap"] == pytest.approx((result["objective"] - result["lower_bound"]) / result["objective"])
+    if result["status"] == "optimal":
+        assert result["objective"] == pytest.approx(optimum)
+
+
+def test_preview_mode_answers_with_the_gap_headers(client):
+    preferences, projects = generate_election(100, 6, 3, "skewed", "overbooked")
+
+    response = client.post(
+        "/assign?mode=preview", json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects}
+    )
+
+    assert response.status_code == 200
+    assert set(response.get_json()) == set(preferences)
+    assert response.headers["X-Solver"] == "preview"
+    assert float(response.headers["X-Solver-Lower-Bound"]) <= float(response.headers["X-Solver-Objective"])
+    assert "X-Cache" not in response.headers
+
+
+def test_unknown_mode_is_rejected(client):
+    response = client.post(
+        "/assign?mode=fast", json={"token": TOKEN, "uid": UID, "preferences": {}, "projects": {}}
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+import pytest
+
+import scenarios
+from benchmark.generator import generate_election
+from conftest import TOKEN, UID
+from flow import flow_assignment
+from scenarios import parse_scenarios, variant_instance
+from solver import build_instance, parse_solver_options
+
+pytest.importorskip("pulp")
+
+SCENARIOS = [
+    {"id": "more seats", "extra_seats": {"p0": 5, "p1": 3}},
+    {"id": "fewer seats", "capacities": {"p2": 1}},
+    {"id": "strict", "penalty": 50},
+]
+
+
+@pytest.mark.parametrize("solver", ["cbc", "highs", "flow"])
+def test_scenario_rows_match_independent_solves(client, solver):
+    preferences, projects = generate_election(60, 6, 2, "skewed", "overbooked")
+
+    response = client.post(
+        f"/assign/scenarios?solver={solver}",
+        json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects, "scenarios": SCENARIOS},
+    )
+
+    assert response.status_code == 200
+    rows = response.get_json()["scenarios"]
+    assert [row["id"] for row in rows] == ["base", "more seats", "fewer seats", "strict"]
+    instance = build_instance(preferences, projects)
+    for variant, row in zip(parse_scenarios(SCENARIOS, projects), rows):
+        _, expected, _ = flow_assignment(variant_instance(instance, variant), variant["penalty"])
+        assert row["objective"] == pytest.approx(expected)
+        assert sum(row["choices"]) == pytest.approx(1.0, abs=1e-3)
+    assert rows[0]["moved"] == 0
+    # more seats can only lower the objective, a higher penalty only raise it
+    assert rows[1]["objective"] <= rows[0]["objective"] <= rows[3]["objective"]
+
+
+def test_invalid_scenarios_are_rejected(client):
+    preferences, projects = generate_election(10, 3, 0)
+
+    response = client.post(
+        "/assign/scenarios?solver=flow",
+        json={"token": TOKEN, "uid": UID, "preferences": preferences, "projects": projects,
+              "scenarios": [{"capacities": {"unknown": 3}}]},
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["error_type"] == "invalid_scenarios"
+
+
+def test_scenarios_share_the_time_limit(monkeypatch):
+    limits = []
+    get_mip_solver = scenarios.get_mip_solver
+
+    def spy(name, options):
+        limits.append(options["time_limit"])
+        return get_mip_solver(name, options)
+
+    monkeypatch.setattr(scenarios, "get_mip_solver", spy)
+    preferences, projects = generate_election(40, 5, 3)
+    variants = parse_scenarios([{"penalty": penalty} for penalty in range(1, 11)], projects)
+
+    scenarios.solve_variants(
+        build_instance(preferences, projects), variants, "cbc", parse_solver_options({"time_limit": 6})
+    )
+
+    # each scenario gets its share of the time left, not the full limit
+    assert len(limits) == len(variants)
+    for index, limit in enumerate(limits):
+        assert limit <= 6 / (len(variants) - index) + 1e-6
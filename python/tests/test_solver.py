@@ -0,0 +1,212 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import decompose
+from benchmark.generator import generate_election
+from decompose import solve_decomposed
+from flow import flow_assignment
+from solver import (
+    DEFAULT_POINTS,
+    MAX_THREADS,
+    MAX_TIME_LIMIT,
+    OVERBOOKING_PENALTY,
+    build_instance,
+    parse_solver_options,
+    solve_assignment,
+)
+
+pulp = pytest.importorskip("pulp")
+
+# (seed, students, projects, popularity, capacity)
+ELECTIONS = [
+    (0, 30, 4, "uniform", "loose"),
+    (1, 60, 6, "skewed", "tight"),
+    (2, 80, 8, "extreme", "overbooked"),
+    (3, 120, 10, "skewed", "overbooked"),
+    (4, 150, 12, "extreme", "tight"),
+]
+
+
+def dense_objective(preferences, projects):
+    """
+    Objective of the original model: one binary per student and project, CBC
+    """
+    students = list(preferences.values())
+    project_keys = list(projects)
+    problem = pulp.LpProblem("CourseAssignment", pulp.LpMinimize)
+    x = pulp.LpVariable.dicts(
+        "x", ((i, j) for i in range(len(students)) for j in range(len(project_keys))), cat="Binary"
+    )
+    o = pulp.LpVariable.dicts("o", range(len(project_keys)), lowBound=0, cat="Integer")
+    problem += pulp.lpSum(
+        points * x[i, project_keys.index(project_id)]
+        for i, student in enumerate(students)
+        for project_id, points in zip(student["selected"], student.get("points", DEFAULT_POINTS))
+    ) + pulp.lpSum(OVERBOOKING_PENALTY * o[j] for j in range(len(project_keys)))
+    for i, student in enumerate(students):
+        problem += pulp.lpSum(x[i, j] for j in range(len(project_keys))) == 1
+        for j, project_id in enumerate(project_keys):
+            if project_id not in student["selected"]:
+                problem += x[i, j] == 0
+    for j, project in enumerate(projects.values()):
+        problem += pulp.lpSum(x[i, j] for i in range(len(students))) <= int(project["max"]) + o[j]
+    problem.solve(pulp.PULP_CBC_CMD(msg=False))
+    return pulp.value(problem.objective)
+
+
+def solution_cost(preferences, projects, solution):
+    """
+    Objective of an assignment, recomputed from the payload
+    """
+    assert set(solution) == set(preferences)
+    cost = 0
+    seats = dict.fromkeys(projects, 0)
+    for student_id, project_id in solution.items():
+        student = preferences[student_id]
+        cost += student.get("points", DEFAULT_POINTS)[student["selected"].index(project_id)]
+        seats[project_id] += 1
+    return cost + OVERBOOKING_PENALTY * sum(
+        max(0, taken - int(projects[project_id]["max"])) for project_id, taken in seats.items()
+    )
+
+
+def split_election(seed, groups, students, projects):
+    """
+    Election of independent groups: students of a group only choose projects of their group
+    """
+    preferences, election_projects = {}, {}
+    for group in range(groups):
+        group_preferences, group_projects = generate_election(
+            students, projects, seed * groups + group, "skewed", "overbooked"
+        )
+        election_projects.update({f"g{group}-{key}": project for key, project in group_projects.items()})
+        preferences.update({
+            f"g{group}-{key}": {**student, "selected": [f"g{group}-{p}" for p in student["selected"]]}
+            for key, student in group_preferences.items()
+        })
+    return preferences, election_projects
+
+
+@pytest.fixture(params=["cbc", "highs", "flow"])
+def solver(request):
+    if request.param == "highs" and not pulp.HiGHS(msg=False).available():
+        pytest.skip("highspy is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("election", ELECTIONS, ids=lambda election: f"seed{election[0]}")
+def test_backends_match_dense_model(solver, election):
+    seed, students, projects, popularity, capacity = election
+    preferences, election_projects = generate_election(students, projects, seed, popularity, capacity)
+
+    result = solve_assignment(preferences, election_projects, solver, parse_solver_options(None))
+
+    expected = dense_objective(preferences, election_projects)
+    assert result["status"] == "optimal"
+    assert result["objective"] == pytest.approx(expected)
+    assert solution_cost(preferences, election_projects, result["solution"]) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_decomposed_matches_dense_model(solver, seed):
+    preferences, election_projects = split_election(seed, 3, 40, 5)
+
+    result = solve_decomposed(preferences, election_projects, solver, parse_solver_options(None))
+
+    expected = dense_objective(preferences, election_projects)
+    assert result["objective"] == pytest.approx(expected)
+    assert solution_cost(preferences, election_projects, result["solution"]) == pytest.approx(expected)
+    if solver != "flow":
+        assert len(result["components"]) == 3
+
+
+def test_decomposed_on_process_pool_matches_dense_model(monkeypatch):
+    monkeypatch.setattr(decompose, "MIN_PARALLEL_CHOICES", 0)
+    preferences, election_projects = split_election(7, 4, 30, 4)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        result = solve_decomposed(
+            preferences, election_projects, "cbc", parse_solver_options(None), executor=executor
+        )
+
+    assert result["objective"] == pytest.approx(dense_objective(preferences, election_projects))
+
+
+@pytest.mark.parametrize("points", [[-1, 0, 1], [1, 2, -4], [-5, -3, -1], [0.5, -2.5, 7]])
+def test_flow_handles_negative_points(points):
+    preferences, election_projects = generate_election(40, 5, 11, "skewed", "tight")
+    for student in list(preferences.values())[::3]:
+        student["points"] = points
+
+    result = solve_assignment(preferences, election_projects, "flow", parse_solver_options({"time_limit": 5}))
+
+    assert result["objective"] == pytest.approx(dense_objective(preferences, election_projects))
+
+
+def test_flow_stops_at_the_deadline():
+    preferences, election_projects = generate_election(50, 5, 12)
+
+    with pytest.raises(TimeoutError):
+        flow_assignment(build_instance(preferences, election_projects), OVERBOOKING_PENALTY, deadline=0)
+
+
+def random_diff(rng, preferences, projects, step):
+    """
+    Change some choices and points, add and remove students and resize projects
+    """
+    preferences = {key: dict(student) for key, student in preferences.items()}
+    projects = {key: dict(project) for key, project in projects.items()}
+    project_ids = list(projects)
+    for student_id in rng.sample(sorted(preferences), 5):
+        preferences[student_id]["selected"] = rng.sample(project_ids, 3)
+    for student_id in rng.sample(sorted(preferences), 2):
+        preferences[student_id]["points"] = rng.choice([[1, 3, 9], [1, 2, 3], DEFAULT_POINTS])
+    for student_id in rng.sample(sorted(preferences), 3):
+        del preferences[student_id]
+    for k in range(3):
+        preferences[f"new{step}-{k}"] = {"selected": rng.sample(project_ids, 3), "points": DEFAULT_POINTS}
+    for project_id in rng.sample(project_ids, 2):
+        projects[project_id]["max"] = max(0, int(projects[project_id]["max"]) + rng.randint(-3, 3))
+    return preferences, projects
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_flow_matches_cold_solve(seed):
+    rng = random.Random(seed)
+    preferences, election_projects = generate_election(100, 8, seed, "skewed", "tight")
+    state = solve_assignment(preferences, election_projects, "flow")["state"]
+
+    for step in range(5):
+        preferences, election_projects = random_diff(rng, preferences, election_projects, step)
+        warm = solve_assignment(preferences, election_projects, "flow", start=state)
+        cold = solve_assignment(preferences, election_projects, "flow")
+
+        assert warm["objective"] == cold["objective"]
+        assert solution_cost(preferences, election_projects, warm["solution"]) == warm["objective"]
+        state = warm["state"]
+
+
+def test_highs_without_highspy_reports_cbc(monkeypatch):
+    monkeypatch.setattr(pulp.HiGHS, "available", lambda self: False)
+    preferences, election_projects = generate_election(30, 4, 5)
+
+    result = solve_assignment(preferences, election_projects, "highs", parse_solver_options(None))
+
+    assert result["solver"] == "cbc"
+    assert result["objective"] == pytest.approx(dense_objective(preferences, election_projects))
+
+
+@pytest.mark.parametrize("time_limit", [0, -1, "nan", "inf", None, "abc"])
+def test_invalid_time_limits_are_rejected(time_limit):
+    with pytest.raises(ValueError):
+        parse_solver_options({"time_limit": time_limit})
+
+
+def test_solver_options_are_capped():
+    options = parse_solver_options({"time_limit": 10 ** 6, "threads": 10 ** 6})
+
+    assert options["time_limit"] == MAX_TIME_LIMIT
+    assert options["threads"] == MAX_THREADS
+    assert parse_solver_options(None)["time_limit"] == MAX_TIME_LIMIT
@@ -0,0 +1,49 @@
+import time
+
+from conftest import TOKEN, UID
+from tokens import TokenCache
+
+
+def test_id_token_is_verified_once_per_app(client, backend):
+    for _ in range(3):
+        assert client.get(f"/cache/stats?token={TOKEN}&uid={UID}").status_code == 200
+
+    assert backend.auth.verified == 1
+    stats = client.get(f"/cache/stats?token={TOKEN}&uid={UID}").get_json()
+    assert stats["id_tokens"]["entries"] == 1
+    assert stats["app_check_tokens"]["hits"] >= 3
+
+
+def test_revocation_sensitive_routes_always_ask_firebase(client, backend):
+    for _ in range(2):
+        client.delete(f"/users/bulk?token={TOKEN}&uid={UID}", json={"uids": []})
+
+    assert backend.auth.verified == 2
+
+
+def test_invalid_tokens_are_rejected_and_not_cached(client, backend):
+    assert client.get(f"/cache/stats?token=forged&uid={UID}").status_code == 401
+    assert client.get(f"/cache/stats?token={TOKEN}&uid=someone-else").status_code == 401
+    assert client.get(
+        f"/cache/stats?token={TOKEN}&uid={UID}", headers={"X-Firebase-AppCheck": "invalid"}
+    ).status_code == 401
+
+    assert client.get(f"/cache/stats?token=forged&uid={UID}").status_code == 401
+    assert backend.auth.verified == 3
+
+
+def test_expired_tokens_are_verified_again():
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        return {"exp": time.time() - 1 if token == "expired" else time.time() + 60}
+
+    cache = TokenCache(verify, max_entries=1)
+    cache.get("expired")
+    cache.get("expired")
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+
+    assert calls == ["expired", "expired", "a", "b", "a"]
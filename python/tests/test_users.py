@@ -0,0 +1,84 @@
+import json
+import types
+
+import pytest
+
+from assign import users_cache
+from conftest import TOKEN, UID
+
+QUERY = f"token={TOKEN}&uid={UID}"
+
+
+def user(index):
+    return types.SimpleNamespace(
+        uid=f"u{index}",
+        email=f"user{index}@example.com",
+        email_verified=False,
+        display_name=f"User {index}",
+        phone_number=None,
+        photo_url=None,
+        disabled=False,
+    )
+
+
+@pytest.fixture
+def listed(backend, monkeypatch):
+    backend.auth.users = [user(index) for index in range(5)]
+    calls = []
+    list_users = backend.auth.list_users
+    monkeypatch.setattr(backend.auth, "list_users", lambda **kwargs: calls.append(kwargs) or list_users(**kwargs))
+    return calls
+
+
+def test_users_are_listed_once_and_answered_with_etag(client, listed):
+    first = client.get(f"/users?{QUERY}")
+
+    assert [entry["uid"] for entry in first.get_json()] == [f"u{index}" for index in range(5)]
+    assert first.headers["ETag"]
+
+    again = client.get(f"/users?{QUERY}", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert again.get_data() == b""
+    assert len(listed) == 1
+
+
+def test_changed_users_get_a_new_etag_after_the_cache_is_cleared(client, backend, listed):
+    etag = client.get(f"/users?{QUERY}").headers["ETag"]
+    backend.auth.users[0].disabled = True
+    users_cache.clear()
+
+    response = client.get(f"/users?{QUERY}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.get_json()[0]["disabled"] is True
+
+
+def test_pages_follow_the_page_token(client, listed):
+    first = client.get(f"/users?{QUERY}&limit=2").get_json()
+    second = client.get(f"/users?{QUERY}&limit=2&page_token={first['next_page_token']}").get_json()
+
+    assert [entry["uid"] for entry in first["users"]] == ["u0", "u1"]
+    assert [entry["uid"] for entry in second["users"]] == ["u2", "u3"]
+    assert listed[0]["max_results"] == 2
+
+
+@pytest.mark.parametrize("limit, expected", [("0", 1), ("-3", 1), ("5000", 1000)])
+def test_page_size_is_clamped(client, listed, limit, expected):
+    assert client.get(f"/users?{QUERY}&limit={limit}").status_code == 200
+    assert listed[0]["max_results"] == expected
+
+
+def test_non_numeric_limit_is_rejected(client, listed):
+    response = client.get(f"/users?{QUERY}&limit=ten")
+
+    assert response.status_code == 400
+    assert response.get_json()["error_type"] == "invalid_limit"
+
+
+def test_stream_sends_one_line_per_user(client, listed):
+    response = client.get(f"/users?{QUERY}&stream=1")
+
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["uid"] for line in lines] == [f"u{index}" for index in range(5)]
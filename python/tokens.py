@@ -0,0 +1,57 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# maximum number of verified tokens kept per cache
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 1024))
+
+
+class TokenCache:
+    """
+    Thread-safe LRU cache of verified tokens, an entry is valid until the token's exp claim
+
+    Only successfully verified tokens are stored, keyed by the SHA-256 digest
+    of the token so the raw token is never kept in memory longer than needed.
+    """
+
+    def __init__(self, verify, max_entries=TOKEN_CACHE_SIZE):
+        self.verify = verify
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        """
+        Decoded claims of a token, verified by the wrapped function on a miss
+
+        Raises:
+            Exception: Whatever the verify function raises for an invalid token
+        """
+        key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry["exp"] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+
+        decoded = self.verify(token)
+        if decoded.get("exp", 0) > now:
+            with self.lock:
+                self.entries[key] = decoded
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return decoded
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}